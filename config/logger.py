@@ -3,46 +3,143 @@
 Logging setup for AMD Ryzen AI Security Layer
 """
 
+import os
+import atexit
 import logging
 import logging.handlers
+import threading
 from config.settings import LOGGING_CONFIG
 
+# Resolved once at import; shared by every logger built below
+_LEVEL = getattr(logging, LOGGING_CONFIG['level'])
+_FORMATTER = logging.Formatter(LOGGING_CONFIG['format'], datefmt=LOGGING_CONFIG['date_format'])
+_LOG_FILE = LOGGING_CONFIG['log_file']
+
+class FastRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that avoids filesystem checks on every emit"""
+    
+    def __init__(self, *args, **kwargs):
+        # Cached os.path.isfile() result for the currently open stream
+        self._is_regular_file = None
+        super().__init__(*args, **kwargs)
+    
+    def shouldRollover(self, record):
+        """Determine if rollover should occur, stat-ing the file only near the size limit"""
+        if self.stream is None:
+            self.stream = self._open()
+            self._is_regular_file = None
+        
+        if self.maxBytes <= 0:
+            return False
+        
+        # Common case: record still fits, no filesystem access needed
+        msg_len = len(self.format(record)) + 1
+        if self.stream.tell() + msg_len < self.maxBytes:
+            return False
+        
+        # Never rollover anything other than regular files (bpo-45401)
+        if self._is_regular_file is None:
+            self._is_regular_file = (not os.path.exists(self.baseFilename)
+                                     or os.path.isfile(self.baseFilename))
+        return self._is_regular_file
+    
+    def doRollover(self):
+        """Rollover and invalidate the cached file check"""
+        super().doRollover()
+        self._is_regular_file = None
+
+def _schedule_flush(handler, interval):
+    """Flush a buffered handler every `interval` seconds from a daemon timer"""
+    def _tick():
+        handler.flush()
+        _schedule_flush(handler, interval)
+    
+    timer = threading.Timer(interval, _tick)
+    timer.daemon = True
+    timer.start()
+
+ROOT_LOGGER_NAME = "amd_security_layer"
+
 class SecurityLogger:
     """Custom logger for the security layer"""
     
     _loggers = {}
+    _lock = threading.Lock()
+    _handlers = None
     
     @staticmethod
-    def get_logger(name):
+    def _build_handlers():
+        """Build the process-wide file and console handlers (called once)"""
+        # File handler with rotation
+        file_handler = FastRotatingFileHandler(
+            _LOG_FILE,
+            maxBytes=LOGGING_CONFIG['max_bytes'],
+            backupCount=LOGGING_CONFIG['backup_count']
+        )
+        
+        # Console handler
+        console_handler = logging.StreamHandler()
+        
+        # Formatter (stateless, one instance shared by all handlers)
+        file_handler.setFormatter(_FORMATTER)
+        console_handler.setFormatter(_FORMATTER)
+        
+        # Buffer file writes; ERROR and above are flushed immediately
+        buffered_handler = logging.handlers.MemoryHandler(
+            capacity=LOGGING_CONFIG['buffer_capacity'],
+            flushLevel=logging.ERROR,
+            target=file_handler,
+            flushOnClose=True
+        )
+        atexit.register(buffered_handler.flush)
+        _schedule_flush(buffered_handler, LOGGING_CONFIG['flush_interval_seconds'])
+        
+        return (buffered_handler, console_handler)
+    
+    @classmethod
+    def get_logger(cls, name):
         """Get or create a logger with the given name"""
-        if name not in SecurityLogger._loggers:
-            logger = logging.getLogger(name)
-            logger.setLevel(getattr(logging, LOGGING_CONFIG['level']))
-            
-            # File handler with rotation
-            file_handler = logging.handlers.RotatingFileHandler(
-                LOGGING_CONFIG['log_file'],
-                maxBytes=LOGGING_CONFIG['max_bytes'],
-                backupCount=LOGGING_CONFIG['backup_count']
-            )
+        # Fast path: dict.get is atomic, no lock once the logger exists
+        logger = cls._loggers.get(name)
+        if logger is not None:
+            return logger
+        
+        with cls._lock:
+            # Re-check under the lock so racing threads don't add duplicate handlers
+            logger = cls._loggers.get(name)
+            if logger is not None:
+                return logger
             
-            # Console handler
-            console_handler = logging.StreamHandler()
+            # Only the top-level logger owns handlers: one log file descriptor
+            # and one rollover check per record, however many loggers exist
+            if cls._handlers is None:
+                cls._handlers = cls._build_handlers()
+                root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+                root_logger.setLevel(_LEVEL)
+                for handler in cls._handlers:
+                    root_logger.addHandler(handler)
+                cls._loggers[ROOT_LOGGER_NAME] = root_logger
+                if name == ROOT_LOGGER_NAME:
+                    return root_logger
             
-            # Formatter
-            formatter = logging.Formatter(LOGGING_CONFIG['format'])
-            file_handler.setFormatter(formatter)
-            console_handler.setFormatter(formatter)
+            logger = logging.getLogger(name)
+            logger.setLevel(_LEVEL)
             
-            logger.addHandler(file_handler)
-            logger.addHandler(console_handler)
+            if name.startswith(ROOT_LOGGER_NAME + "."):
+                # Children inherit the top-level handlers through propagation
+                logger.propagate = True
+            else:
+                # Module loggers (src.*, __main__, ...) live outside the namespace,
+                # so they get the same shared handler objects instead of new ones
+                for handler in cls._handlers:
+                    logger.addHandler(handler)
             
-            SecurityLogger._loggers[name] = logger
+            cls._loggers[name] = logger
         
-        return SecurityLogger._loggers[name]
+        return logger
 
 # Initialize default logger
-logger = SecurityLogger.get_logger("amd_security_layer")
+logger = SecurityLogger.get_logger(ROOT_LOGGER_NAME)
 
 if __name__ == "__main__":
     test_logger = SecurityLogger.get_logger("test")
@@ -4,7 +4,10 @@ Configuration and constants for AMD Ryzen AI Security Layer
 """
 
 import os
+import sys
+import functools
 from pathlib import Path
+from types import MappingProxyType
 
 # Project paths
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -12,16 +15,21 @@ SRC_DIR = PROJECT_ROOT / "src"
 MODELS_DIR = PROJECT_ROOT / "models"
 DATA_DIR = PROJECT_ROOT / "data"
 LOGS_DIR = PROJECT_ROOT / "logs"
+# Per-user cache for derived artifacts (e.g. optimized ORT graphs); created on first use
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "amd-security-layer"
 
 # Create logs directory if it doesn't exist
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Config tables are read-only views: they are fixed for the process lifetime
+
 # ============ THREAT DETECTION SETTINGS ============
-DETECTION_CONFIG = {
+DETECTION_CONFIG = MappingProxyType({
     "phishing": {
         "model_path": str(MODELS_DIR / "phishing_model.onnx"),
         "confidence_threshold": 0.7,
         "timeout_ms": 500,
+        "cache_size": 8192,  # verdicts remembered per (url, context score)
     },
     "malware": {
         "model_path": str(MODELS_DIR / "malware_model.onnx"),
@@ -31,19 +39,34 @@ DETECTION_CONFIG = {
     "behavior": {
         "anomaly_threshold": 0.8,
         "window_size": 100,  # number of actions to monitor
+    },
+    "engine": {
+        "latency_window": 10000,  # most recent latencies kept for statistics
+        "cache_size": 4096,  # url/code results remembered by content hash (0 disables)
+        "cache_ttl_seconds": 300,
+        "queue_size": 4096,  # pending async threats; the oldest is dropped when full
     }
-}
+})
 
 # ============ HARDWARE ACCELERATION SETTINGS ============
-HARDWARE_CONFIG = {
+HARDWARE_CONFIG = MappingProxyType({
     "use_gpu": True,
     "use_npu": True,
     "device": "cuda",  # "cuda" for GPU, "cpu" for CPU
     "optimization_level": "O2",  # Optimization level
-}
+    "gpu_mem_limit_mb": 0,  # ORT GPU arena cap, 0 = no limit
+    "intra_op_num_threads": 0,  # 0 = derive from physical cores
+    "inter_op_num_threads": 0,  # 0 = default (2 when several models are loaded)
+    # Opt-in: one process-wide ORT thread pool for all sessions. This changes global
+    # ORT state; afterwards every InferenceSession in the process, including other
+    # libraries' and NPUOptimizer's, must set use_per_session_threads = False
+    "share_thread_pool": False,
+    "gpu_graph_capture": True,  # Replay fixed-shape bound runs as CUDA/HIP graphs
+    "stable_input_shapes": True,  # Let cuDNN/MIOpen autotune and cache conv algorithms per shape
+})
 
 # ============ EXPLAINABILITY SETTINGS ============
-EXPLAINABILITY_CONFIG = {
+EXPLAINABILITY_CONFIG = MappingProxyType({
     "model_name": "distilbert-base-uncased",  # For NLP explanations
     "max_explanation_length": 150,
     "threat_categories": {
@@ -52,77 +75,88 @@ EXPLAINABILITY_CONFIG = {
         "behavioral": "Suspicious Behavior",
         "unknown": "Potential Threat"
     }
-}
+})
 
 # ============ PRIVACY SETTINGS ============
-PRIVACY_CONFIG = {
+PRIVACY_CONFIG = MappingProxyType({
     "log_threats_locally": True,
     "encrypt_local_logs": True,
     "data_retention_days": 30,
     "cloud_sync": False,  # No cloud sync - privacy-first
-}
+})
 
 # ============ UI/ALERT SETTINGS ============
-ALERT_CONFIG = {
+ALERT_CONFIG = MappingProxyType({
     "alert_timeout_seconds": 10,
     "auto_dismiss": True,
     "show_details": True,
     "alert_sound": True,
     "log_alerts": True,
-}
+})
 
 # ============ LOGGING SETTINGS ============
-LOGGING_CONFIG = {
+LOGGING_CONFIG = MappingProxyType({
     "level": "INFO",
-    "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    # An explicit datefmt skips the default msecs formatting path, so the format adds them back
+    "format": "%(asctime)s,%(msecs)03d - %(name)s - %(levelname)s - %(message)s",
+    "date_format": "%Y-%m-%d %H:%M:%S",
     "log_file": str(LOGS_DIR / "security_layer.log"),
     "max_bytes": 10485760,  # 10MB
     "backup_count": 5,
-}
+    "buffer_capacity": 512,  # records buffered before writing to disk
+    "flush_interval_seconds": 30,
+})
 
 # ============ MODEL SETTINGS ============
-MODEL_CONFIG = {
+MODEL_CONFIG = MappingProxyType({
     "quantization_enabled": True,
     "quantization_type": "int8",  # int8, float16
     "batch_size": 1,
     "input_shape": (1, 384),  # Standard BERT input
-}
+})
 
 # ============ PERFORMANCE MONITORING ============
-MONITORING_CONFIG = {
+MONITORING_CONFIG = MappingProxyType({
     "track_latency": True,
     "track_memory": True,
     "track_gpu_usage": True,
     "sampling_interval_ms": 100,
-}
+})
 
 # ============ DATABASE SETTINGS ============
-DATABASE_CONFIG = {
+DATABASE_CONFIG = MappingProxyType({
     "threat_db_path": str(DATA_DIR / "threats.db"),
     "patterns_db_path": str(DATA_DIR / "phishing_patterns.json"),
     "signatures_db_path": str(DATA_DIR / "malware_signatures.json"),
-}
+})
+
+@functools.cache
+def _build_config_block() -> str:
+    """Render the configuration summary once; settings are fixed after import"""
+    return "\n".join([
+        "=" * 60,
+        "AMD RYZEN AI SECURITY LAYER - CONFIGURATION",
+        "=" * 60,
+        f"Project Root: {PROJECT_ROOT}",
+        f"Models Directory: {MODELS_DIR}",
+        f"Data Directory: {DATA_DIR}",
+        f"Logs Directory: {LOGS_DIR}",
+        "\nDetection Thresholds:",
+        f"  Phishing: {DETECTION_CONFIG['phishing']['confidence_threshold']}",
+        f"  Malware: {DETECTION_CONFIG['malware']['confidence_threshold']}",
+        "\nHardware Acceleration:",
+        f"  GPU Enabled: {HARDWARE_CONFIG['use_gpu']}",
+        f"  NPU Enabled: {HARDWARE_CONFIG['use_npu']}",
+        f"  Device: {HARDWARE_CONFIG['device']}",
+        "\nPrivacy Settings:",
+        f"  Cloud Sync: {PRIVACY_CONFIG['cloud_sync']}",
+        f"  Local Encryption: {PRIVACY_CONFIG['encrypt_local_logs']}",
+        "=" * 60,
+    ]) + "\n"
 
 def print_config():
     """Print all configuration settings"""
-    print("=" * 60)
-    print("AMD RYZEN AI SECURITY LAYER - CONFIGURATION")
-    print("=" * 60)
-    print(f"Project Root: {PROJECT_ROOT}")
-    print(f"Models Directory: {MODELS_DIR}")
-    print(f"Data Directory: {DATA_DIR}")
-    print(f"Logs Directory: {LOGS_DIR}")
-    print("\nDetection Thresholds:")
-    print(f"  Phishing: {DETECTION_CONFIG['phishing']['confidence_threshold']}")
-    print(f"  Malware: {DETECTION_CONFIG['malware']['confidence_threshold']}")
-    print("\nHardware Acceleration:")
-    print(f"  GPU Enabled: {HARDWARE_CONFIG['use_gpu']}")
-    print(f"  NPU Enabled: {HARDWARE_CONFIG['use_npu']}")
-    print(f"  Device: {HARDWARE_CONFIG['device']}")
-    print("\nPrivacy Settings:")
-    print(f"  Cloud Sync: {PRIVACY_CONFIG['cloud_sync']}")
-    print(f"  Local Encryption: {PRIVACY_CONFIG['encrypt_local_logs']}")
-    print("=" * 60)
+    sys.stdout.write(_build_config_block())
 
 if __name__ == "__main__":
     print_config()
@@ -7,26 +7,31 @@ Demonstrates real-time phishing detection on Ryzen AI
 import sys
 sys.path.insert(0, '..')
 
-from src.threat_detection.phishing_detector import PhishingDetector
-from src.security_core.threat_engine import ThreatEngine
-from src.explainability.threat_explainer import ThreatExplainer
-
 def print_result(url, result):
     """Pretty print detection result"""
-    print(f"\n{'='*70}")
-    print(f"URL: {url}")
-    print(f"{'='*70}")
-    print(f"Phishing Detected: {result['is_phishing']}")
-    print(f"Confidence: {result['confidence']:.2%}")
-    print(f"Threat Level: {result['threat_level'].upper()}")
-    print(f"\nDetection Reasons:")
-    for reason in result['reasons']:
-        print(f"  • {reason}")
+    parts = [
+        f"\n{'='*70}",
+        f"URL: {url}",
+        f"{'='*70}",
+        f"Phishing Detected: {result['is_phishing']}",
+        f"Confidence: {result['confidence']:.2%}",
+        f"Threat Level: {result['threat_level'].upper()}",
+        f"\nDetection Reasons:",
+    ]
+    parts.extend(f"  • {reason}" for reason in result['reasons'])
     
     if result.get('latency_ms'):
-        print(f"\nLatency: {result['latency_ms']:.2f}ms (< 500ms target)")
+        parts.append(f"\nLatency: {result['latency_ms']:.2f}ms (< 500ms target)")
+    
+    # One write per result instead of a print() per line
+    sys.stdout.write("\n".join(parts) + "\n")
 
 def main():
+    # Imported here so importing the demo module stays cheap
+    from src.threat_detection.phishing_detector import PhishingDetector
+    from src.security_core.threat_engine import ThreatEngine
+    from src.explainability.threat_explainer import ThreatExplainer
+    
     print("""
     ╔═══════════════════════════════════════════════════════════════╗
     ║         AMD Ryzen AI - Phishing Detection Demo               ║
@@ -37,7 +42,7 @@ def main():
     # Initialize detectors
     detector = PhishingDetector()
     engine = ThreatEngine()
-    explainer = ThreatExplainer()
+    explainer = ThreatExplainer.instance()
     
     # Test cases
     test_urls = [
@@ -7,12 +7,12 @@ Demonstrates alert creation, user interaction, and notifications
 import sys
 sys.path.insert(0, '..')
 
-from src.security_core.threat_engine import ThreatEngine
-from src.security_core.alert_manager import AlertManager, AlertFormatter
-
 def print_alert_ui(formatted_alert):
     """Print alert in UI format"""
-    print(f"""
+    buttons = "".join(f"    [{action['label']}] " for action in formatted_alert['action_buttons'])
+    
+    # Build the whole banner and emit it in a single write
+    sys.stdout.write(f"""
     ╔════════════════════════════════════════════════════════════════╗
     ║  {formatted_alert['icon']} {formatted_alert['title']}
     ╚════════════════════════════════════════════════════════════════╝
@@ -24,16 +24,17 @@ def print_alert_ui(formatted_alert):
     
     ┌────────────────────────────────────────────────────────────────┐
     │ Actions:                                                        │
-    """)
-    
-    for action in formatted_alert['action_buttons']:
-        print(f"    [{action['label']}] ", end="")
     
-    print("""
+{buttons}
     └────────────────────────────────────────────────────────────────┘
-    """)
+    
+""")
 
 def main():
+    # Imported here so importing the demo module stays cheap
+    from src.security_core.threat_engine import ThreatEngine
+    from src.security_core.alert_manager import AlertManager, AlertFormatter
+    
     print("""
     ╔════════════════════════════════════════════════════════════════╗
     ║        AMD Ryzen AI - Threat Alert Management Demo            ║
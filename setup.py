@@ -39,6 +39,8 @@ setup(
     extras_require={
         "gpu": ["torch>=2.0.0"],
         "ml": ["transformers>=4.30.0"],
+        # Optional accelerators; each has a pure-Python fallback when missing
+        "perf": ["numba>=0.57.0", "xxhash>=3.0.0", "orjson>=3.8.0", "pyahocorasick>=2.0.0"],
         "dev": ["pytest>=7.0.0", "black>=23.0.0", "flake8>=6.0.0"],
     },
     entry_points={
@@ -4,47 +4,155 @@ Threat Explainer Module
 Generates plain-language explanations for detected threats
 """
 
+import io
 import re
-from typing import Dict, List
+import functools
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Tuple
 from config.settings import EXPLAINABILITY_CONFIG
-from config.logger import SecurityLogger
 
-logger = SecurityLogger.get_logger(__name__)
+@functools.cache
+def _log():
+    """Lazily create the module logger so importing this module opens no log files"""
+    # On interpreters with PEP 810 lazy imports this can become a plain
+    # `lazy from config.logger import SecurityLogger` at module level
+    from config.logger import SecurityLogger
+    return SecurityLogger.get_logger(__name__)
+
+# Technical term -> plain-language replacement (keys are lower-case)
+_NOVICE_MAP = {
+    "malware": "harmful software",
+    "phishing": "fake login attempt",
+    "url": "link",
+    "credentials": "username and password",
+    "execute": "run",
+    "behavioral anomaly": "unusual activity",
+}
+
+# Single alternation so simplification is one pass over the text (longest terms first)
+_NOVICE_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(k) for k in sorted(_NOVICE_MAP, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+
+# Explanation templates by threat type and severity
+_EXPLANATION_TEMPLATES = {
+    "phishing": {
+        "high": "This link appears to be a phishing attempt designed to steal your credentials. Avoid clicking.",
+        "medium": "This link may be suspicious. Verify the sender before clicking.",
+        "low": "This link seems unusual but may be safe. Use caution.",
+    },
+    "malware": {
+        "high": "Malicious code detected. This could harm your system. Do not execute.",
+        "medium": "Suspicious code detected. Please review before proceeding.",
+        "low": "This code contains potentially suspicious patterns.",
+    },
+    "behavioral": {
+        "high": "Suspicious activity detected on your system. Investigate immediately.",
+        "medium": "Unusual system behavior detected. Monitor your system.",
+        "low": "Minor unusual activity detected.",
+    },
+    "unknown": {
+        "high": "Unknown threat detected. Use caution.",
+        "medium": "Potential threat detected.",
+        "low": "Minor concern detected.",
+    }
+}
+
+# Security recommendations by threat type
+_RECOMMENDATIONS = {
+    "phishing": (
+        "Do not click the link",
+        "Do not enter your credentials",
+        "Report the sender",
+        "Verify the official website separately"
+    ),
+    "malware": (
+        "Do not execute the code",
+        "Run a full system scan",
+        "Update your antivirus",
+        "Be cautious with similar files"
+    ),
+    "behavioral": (
+        "Monitor your system activity",
+        "Check running processes",
+        "Review recent file modifications",
+        "Consider system restore if suspicious"
+    )
+}
+_DEFAULT_RECOMMENDATIONS = ("Update security software",)
+
+# Immediate action items by threat type (read-only; callers get their own dict copies)
+_ACTIONS = MappingProxyType({
+    "phishing": MappingProxyType({
+        "immediate": "Block this sender/URL",
+        "next": "Review similar messages",
+        "long_term": "Enable two-factor authentication"
+    }),
+    "malware": MappingProxyType({
+        "immediate": "Quarantine/delete the file",
+        "next": "Run full system scan",
+        "long_term": "Keep software updated"
+    }),
+    "behavioral": MappingProxyType({
+        "immediate": "Monitor the system",
+        "next": "Check system logs",
+        "long_term": "Improve security practices"
+    })
+})
+_DEFAULT_ACTIONS = MappingProxyType({
+    "immediate": "Take appropriate action",
+    "next": "Monitor the situation",
+    "long_term": "Improve security"
+})
+
+# UI display banner; only the placeholders are formatted per call
+_DISPLAY_HEADER = """
+╔════════════════════════════════════════════════════════════╗
+║                    SECURITY THREAT ALERT                   ║
+╚════════════════════════════════════════════════════════════╝
+
+Threat Type: {threat_type}
+Severity: {severity}
+Confidence: {confidence:.1f}%
+
+─────────────────────────────────────────────────────────────
+Alert Message:
+{user_friendly}
+
+─────────────────────────────────────────────────────────────
+Details:
+{detailed}
+
+─────────────────────────────────────────────────────────────
+Recommendations:
+"""
+_DISPLAY_FOOTER = "─────────────────────────────────────────────────────────────\n"
 
 class ThreatExplainer:
     """Generates user-friendly threat explanations"""
     
+    __slots__ = ("threat_categories", "max_length", "explanation_templates")
+    
+    _instance = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def instance(cls) -> "ThreatExplainer":
+        """Get the shared process-wide explainer, creating it on first use"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
     def __init__(self):
         """Initialize threat explainer"""
         self.threat_categories = EXPLAINABILITY_CONFIG['threat_categories']
         self.max_length = EXPLAINABILITY_CONFIG['max_explanation_length']
-        self.explanation_templates = self._init_templates()
-        logger.info("ThreatExplainer initialized")
-    
-    def _init_templates(self) -> Dict:
-        """Initialize explanation templates"""
-        return {
-            "phishing": {
-                "high": "This link appears to be a phishing attempt designed to steal your credentials. Avoid clicking.",
-                "medium": "This link may be suspicious. Verify the sender before clicking.",
-                "low": "This link seems unusual but may be safe. Use caution.",
-            },
-            "malware": {
-                "high": "Malicious code detected. This could harm your system. Do not execute.",
-                "medium": "Suspicious code detected. Please review before proceeding.",
-                "low": "This code contains potentially suspicious patterns.",
-            },
-            "behavioral": {
-                "high": "Suspicious activity detected on your system. Investigate immediately.",
-                "medium": "Unusual system behavior detected. Monitor your system.",
-                "low": "Minor unusual activity detected.",
-            },
-            "unknown": {
-                "high": "Unknown threat detected. Use caution.",
-                "medium": "Potential threat detected.",
-                "low": "Minor concern detected.",
-            }
-        }
+        self.explanation_templates = _EXPLANATION_TEMPLATES
+        _log().info("ThreatExplainer initialized")
     
     def explain_threat(self, threat_data: Dict) -> Dict:
         """
@@ -60,183 +168,130 @@ class ThreatExplainer:
         Returns:
             Dict with explanation
         """
-        try:
-            threat_type = threat_data.get('threat_type', 'unknown')
-            confidence = threat_data.get('confidence', 0.0)
-            reasons = threat_data.get('reasons', [])
-            
-            # Determine severity level
-            severity = self._get_severity_level(confidence)
-            
-            # Generate explanation
-            base_explanation = self._get_template_explanation(threat_type, severity)
-            detailed_explanation = self._generate_detailed_explanation(threat_type, reasons, severity)
-            
-            explanation = {
-                "threat_type": threat_type,
-                "severity": severity,
-                "confidence": confidence,
-                "user_friendly": base_explanation,
-                "detailed": detailed_explanation,
-                "recommendations": self._get_recommendations(threat_type, severity),
-                "action_items": self._get_action_items(threat_type)
-            }
-            
-            logger.info(f"Explanation generated for {threat_type}: {severity}")
-            return explanation
+        # Normalise inputs up front; missing or None fields fall back to defaults
+        threat_type = threat_data.get('threat_type') or 'unknown'
+        confidence = float(threat_data.get('confidence') or 0.0)
+        reasons = threat_data.get('reasons') or []
+        
+        # Determine severity level
+        # Integer bucket (0.05 wide) keeps the severity cache key space tiny. Clamping
+        # first keeps int() total: +inf lands in the top bucket, and NaN (which loses
+        # every comparison, so max() keeps 0.0) and -inf land in the bottom one
+        severity = self._get_severity_level(int(min(1.0, max(0.0, confidence)) * 20))
+        
+        # Text depends only on type, severity and reasons; confidence is filled in per call
+        explanation = dict(self._explain_cached(threat_type, severity, tuple(reasons), self.max_length))
+        explanation["confidence"] = confidence
+        # The cached entry is shared, so hand out a mutable copy of its only nested mapping
+        explanation["action_items"] = dict(explanation["action_items"])
         
-        except Exception as e:
-            logger.error(f"Error generating explanation: {e}")
-            return {
-                "threat_type": "unknown",
-                "severity": "medium",
-                "user_friendly": "A security concern was detected.",
-                "detailed": "Unable to generate detailed explanation.",
-                "recommendations": ["Review security settings"]
-            }
+        _log().info(f"Explanation generated for {threat_type}: {severity}")
+        return explanation
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _explain_cached(threat_type: str, severity: str, reasons: Tuple[str, ...],
+                        max_length: int) -> MappingProxyType:
+        """Build the explanation for a (type, severity, reasons, length limit) combination once"""
+        return MappingProxyType({
+            "threat_type": threat_type,
+            "severity": severity,
+            "confidence": 0.0,
+            "user_friendly": ThreatExplainer._get_template_explanation(threat_type, severity),
+            "detailed": ThreatExplainer._generate_detailed_explanation(threat_type, reasons, severity, max_length),
+            "recommendations": ThreatExplainer._get_recommendations(threat_type, severity),
+            "action_items": ThreatExplainer._get_action_items(threat_type)
+        })
     
-    def _get_severity_level(self, confidence: float) -> str:
-        """Map confidence score to severity level"""
-        if confidence >= 0.85:
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_severity_level(confidence_bucket: int) -> str:
+        """Map confidence bucket (confidence * 20) to severity level"""
+        if confidence_bucket >= 17:  # confidence >= 0.85
             return "high"
-        elif confidence >= 0.65:
+        elif confidence_bucket >= 13:  # confidence >= 0.65
             return "medium"
         else:
             return "low"
     
-    def _get_template_explanation(self, threat_type: str, severity: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_template_explanation(threat_type: str, severity: str) -> str:
         """Get template explanation for threat"""
-        templates = self.explanation_templates.get(threat_type, self.explanation_templates['unknown'])
+        templates = _EXPLANATION_TEMPLATES.get(threat_type, _EXPLANATION_TEMPLATES['unknown'])
         return templates.get(severity, templates.get('medium', 'Threat detected.'))
     
-    def _generate_detailed_explanation(self, threat_type: str, reasons: List[str], severity: str) -> str:
+    @staticmethod
+    def _generate_detailed_explanation(threat_type: str, reasons: List[str], severity: str,
+                                       max_length: int) -> str:
         """Generate detailed explanation combining multiple reasons"""
         if not reasons:
             return "No details available."
         
         # Start with base reason
-        details = f"This {threat_type} threat was detected because: "
+        buf = io.StringIO()
+        buf.write(f"This {threat_type} threat was detected because: ")
         
         # Add reasons in readable format
         if len(reasons) == 1:
-            details += reasons[0] + "."
+            buf.write(reasons[0] + ".")
         else:
-            # Group reasons
-            unique_reasons = list(set(reasons))[:3]  # Max 3 reasons
-            details += "\n• " + "\n• ".join(unique_reasons)
+            # Group reasons: order-preserving dedup, stop at max 3 reasons,
+            # or as soon as the text is already past the display limit
+            seen = set()
+            for reason in reasons:
+                if reason not in seen:
+                    seen.add(reason)
+                    buf.write("\n• " + reason)
+                    if len(seen) == 3 or buf.tell() > max_length:
+                        break
         
         # Truncate if too long
-        if len(details) > self.max_length:
-            details = details[:self.max_length-3] + "..."
+        details = buf.getvalue()
+        if buf.tell() > max_length:
+            details = details[:max_length-3] + "..."
         
         return details
     
-    def _get_recommendations(self, threat_type: str, severity: str) -> List[str]:
+    @staticmethod
+    def _get_recommendations(threat_type: str, severity: str) -> Tuple[str, ...]:
         """Get security recommendations for threat"""
-        recommendations = {
-            "phishing": [
-                "Do not click the link",
-                "Do not enter your credentials",
-                "Report the sender",
-                "Verify the official website separately"
-            ],
-            "malware": [
-                "Do not execute the code",
-                "Run a full system scan",
-                "Update your antivirus",
-                "Be cautious with similar files"
-            ],
-            "behavioral": [
-                "Monitor your system activity",
-                "Check running processes",
-                "Review recent file modifications",
-                "Consider system restore if suspicious"
-            ]
-        }
-        
-        base_recs = recommendations.get(threat_type, ["Update security software"])
+        recs = _RECOMMENDATIONS.get(threat_type, _DEFAULT_RECOMMENDATIONS)
         
         # Adjust recommendations based on severity
         if severity == "high":
-            base_recs.append("Take immediate action")
+            return (*recs, "Take immediate action")
         
-        return base_recs
+        return recs
     
-    def _get_action_items(self, threat_type: str) -> Dict:
+    @staticmethod
+    def _get_action_items(threat_type: str) -> MappingProxyType:
         """Get immediate action items"""
-        actions = {
-            "phishing": {
-                "immediate": "Block this sender/URL",
-                "next": "Review similar messages",
-                "long_term": "Enable two-factor authentication"
-            },
-            "malware": {
-                "immediate": "Quarantine/delete the file",
-                "next": "Run full system scan",
-                "long_term": "Keep software updated"
-            },
-            "behavioral": {
-                "immediate": "Monitor the system",
-                "next": "Check system logs",
-                "long_term": "Improve security practices"
-            }
-        }
-        
-        return actions.get(threat_type, {
-            "immediate": "Take appropriate action",
-            "next": "Monitor the situation",
-            "long_term": "Improve security"
-        })
+        return _ACTIONS.get(threat_type, _DEFAULT_ACTIONS)
     
     def format_for_display(self, explanation: Dict) -> str:
         """Format explanation for UI display"""
-        output = f"""
-╔════════════════════════════════════════════════════════════╗
-║                    SECURITY THREAT ALERT                   ║
-╚════════════════════════════════════════════════════════════╝
-
-Threat Type: {explanation.get('threat_type', 'Unknown').upper()}
-Severity: {explanation.get('severity', 'Medium').upper()}
-Confidence: {explanation.get('confidence', 0.0)*100:.1f}%
-
-─────────────────────────────────────────────────────────────
-Alert Message:
-{explanation.get('user_friendly', 'Threat detected')}
-
-─────────────────────────────────────────────────────────────
-Details:
-{explanation.get('detailed', 'No details available')}
-
-─────────────────────────────────────────────────────────────
-Recommendations:
-"""
-        for i, rec in enumerate(explanation.get('recommendations', []), 1):
-            output += f"  {i}. {rec}\n"
-        
-        output += "─────────────────────────────────────────────────────────────\n"
+        recs = "".join(f"  {i}. {rec}\n"
+                       for i, rec in enumerate(explanation.get('recommendations', []), 1))
         
-        return output
+        header = _DISPLAY_HEADER.format_map({
+            "threat_type": explanation.get('threat_type', 'Unknown').upper(),
+            "severity": explanation.get('severity', 'Medium').upper(),
+            "confidence": explanation.get('confidence', 0.0) * 100,
+            "user_friendly": explanation.get('user_friendly', 'Threat detected'),
+            "detailed": explanation.get('detailed', 'No details available'),
+        })
+        return header + recs + _DISPLAY_FOOTER
 
 class ExplanationOptimizer:
     """Optimize explanations for different user expertise levels"""
     
+    __slots__ = ()
+    
     @staticmethod
     def simplify_for_novice(explanation: str) -> str:
         """Simplify technical terms for non-technical users"""
-        replacements = {
-            "malware": "harmful software",
-            "phishing": "fake login attempt",
-            "URL": "link",
-            "credentials": "username and password",
-            "execute": "run",
-            "behavioral anomaly": "unusual activity",
-        }
-        
-        simplified = explanation
-        for technical, simple in replacements.items():
-            simplified = re.sub(technical, simple, simplified, flags=re.IGNORECASE)
-        
-        return simplified
+        return _NOVICE_RE.sub(lambda m: _NOVICE_MAP[m.group(1).lower()], explanation)
     
     @staticmethod
     def expand_for_expert(explanation: str) -> str:
@@ -5,16 +5,43 @@ Handles model loading and inference with hardware acceleration
 """
 
 import os
+import mmap
+import platform
+import hashlib
+import tempfile
 import numpy as np
-from typing import Dict, List, Tuple, Optional
-from config.settings import HARDWARE_CONFIG, MODEL_CONFIG
+from collections import Counter
+from typing import Dict, List, Tuple, Optional, Union
+from config.settings import HARDWARE_CONFIG, MODEL_CONFIG, CACHE_DIR
 from config.logger import SecurityLogger
 
 logger = SecurityLogger.get_logger(__name__)
 
+# Node types worth quantizing; tree/embedding-heavy graphs gain little elsewhere
+QUANTIZABLE_OP_TYPES = ("MatMul", "Gemm", "Conv")
+
+# Node types kept in float32 during fp16 conversion because they overflow or lose accuracy
+FP16_OP_BLOCK_LIST = ("Softmax", "LayerNormalization")
+
+# ONNX tensor element types -> numpy dtypes (np.dtype("float") would be float64)
+ORT_TYPE_TO_NUMPY = {
+    "tensor(float)": np.dtype(np.float32),
+    "tensor(float16)": np.dtype(np.float16),
+    "tensor(double)": np.dtype(np.float64),
+    "tensor(int64)": np.dtype(np.int64),
+    "tensor(int32)": np.dtype(np.int32),
+    "tensor(int16)": np.dtype(np.int16),
+    "tensor(int8)": np.dtype(np.int8),
+    "tensor(uint8)": np.dtype(np.uint8),
+    "tensor(bool)": np.dtype(np.bool_),
+}
+
 class ONNXRuntimeManager:
     """Manages ONNX Runtime for lightweight model inference"""
     
+    # Global ORT thread pools can be created once per process
+    _global_pool_ready = False
+    
     def __init__(self, use_gpu: bool = True):
         """
         Initialize ONNX Runtime Manager
@@ -23,8 +50,23 @@ class ONNXRuntimeManager:
             use_gpu: Whether to use GPU acceleration
         """
         self.use_gpu = use_gpu and HARDWARE_CONFIG['use_gpu']
-        self.sessions = {}
-        self.model_info = {}
+        # Loaded models are stored column-wise: _mid maps a name to its row in
+        # the parallel lists below; unload swap-pops to keep the rows dense
+        self._mid = {}
+        self._names = []
+        self._sessions = []
+        self._hashes = []
+        self._paths = []
+        self._input_names = []
+        self._output_names = []
+        self._input_shapes = []
+        self._input_dtypes = []
+        self._names_view = ()
+        self._binding_cache = {}  # (model_name, input signature) -> IOBinding + buffers
+        self._sessions_by_hash = {}  # model content hash -> shared session
+        self._ref = Counter()  # model content hash -> number of names using it
+        self._dtype_warnings = set()  # (model_name, input_name, given dtype) already reported
+        self.binding_device = "cpu"
         
         try:
             import onnxruntime as ort
@@ -44,22 +86,124 @@ class ONNXRuntimeManager:
             return
         
         providers = []
+        available = self.ort.get_available_providers()
+        
+        # Physical cores drive the intra-op thread budget shared across models
+        try:
+            import psutil
+            self.physical_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+        except ImportError:
+            self.physical_cores = os.cpu_count() or 1
+        
+        # Opt-in (share_thread_pool): every session draws from one intra-op and one
+        # inter-op pool instead of spawning its own, so several loaded models do not
+        # oversubscribe cores. The pools are process-wide, so any other session created
+        # in this process afterwards must also set use_per_session_threads = False
+        if HARDWARE_CONFIG['share_thread_pool'] and not ONNXRuntimeManager._global_pool_ready:
+            try:
+                self.ort.set_global_thread_pool_sizes(
+                    HARDWARE_CONFIG['intra_op_num_threads'] or self.physical_cores,
+                    HARDWARE_CONFIG['inter_op_num_threads'] or 2
+                )
+                ONNXRuntimeManager._global_pool_ready = True
+            except Exception as e:
+                logger.warning(f"Shared ORT thread pool unavailable, using per-session threads: {e}")
+        self.global_thread_pool = HARDWARE_CONFIG['share_thread_pool'] and ONNXRuntimeManager._global_pool_ready
+        
+        # Ryzen AI NPU (XDNA) through the Vitis AI EP; it only runs int8 QDQ models
+        self.npu_provider = None
+        if HARDWARE_CONFIG['use_npu'] and 'VitisAIExecutionProvider' in available:
+            self.npu_provider = 'VitisAIExecutionProvider'
+            providers.append((self.npu_provider, {
+                'config_file': os.environ.get('VAIP_CONFIG', 'vaip_config.json'),
+                'cacheDir': os.path.join(tempfile.gettempdir(), 'vaip_cache'),
+            }))
+            logger.info("Vitis AI provider available - AMD Ryzen AI NPU acceleration enabled")
+        
+        # GPU arena grows only by what is requested instead of doubling
+        gpu_options = {'arena_extend_strategy': 'kSameAsRequested'}
+        if HARDWARE_CONFIG['gpu_mem_limit_mb']:
+            gpu_options['gpu_mem_limit'] = HARDWARE_CONFIG['gpu_mem_limit_mb'] * 1024 * 1024
+        
+        # Graph capture lets infer_bound replay a whole fixed-shape run with one launch
+        self.graph_capture = bool(self.use_gpu and HARDWARE_CONFIG['gpu_graph_capture'])
         
-        # Add GPU provider if available
+        # Add GPU provider if available, AMD first
+        self.gpu_provider = None
         if self.use_gpu:
-            if 'CUDAExecutionProvider' in self.ort.get_available_providers():
-                providers.append('CUDAExecutionProvider')
-                logger.info("CUDA provider available")
-            elif 'ROCMExecutionProvider' in self.ort.get_available_providers():
-                providers.append('ROCMExecutionProvider')
+            if 'ROCMExecutionProvider' in available:
+                self.gpu_provider = 'ROCMExecutionProvider'
+                if self.graph_capture:
+                    gpu_options = {**gpu_options, 'enable_hip_graph': '1'}
+                providers.append((self.gpu_provider, gpu_options))
                 logger.info("ROCm provider available - AMD GPU acceleration enabled")
+            elif 'DmlExecutionProvider' in available:
+                self.gpu_provider = 'DmlExecutionProvider'
+                providers.append(self.gpu_provider)
+                logger.info("DirectML provider available - integrated GPU acceleration enabled")
+            elif 'CUDAExecutionProvider' in available:
+                self.gpu_provider = 'CUDAExecutionProvider'
+                if self.graph_capture:
+                    gpu_options = {**gpu_options, 'enable_cuda_graph': '1'}
+                providers.append((self.gpu_provider, gpu_options))
+                logger.info("CUDA provider available")
         
         # Add CPU provider as fallback
         providers.append('CPUExecutionProvider')
         
         self.execution_providers = providers
+        
+        # Release unused arena memory after each run so resident memory
+        # tracks the working set when several models share the host
+        shrink_devices = "cpu:0"
+        if self.gpu_provider in ('ROCMExecutionProvider', 'CUDAExecutionProvider'):
+            # ROCm builds of ORT expose GPU memory under the "cuda" device type too
+            self.binding_device = "cuda"
+            shrink_devices += ";gpu:0"
+        else:
+            self.graph_capture = False
+        self.run_options = self.ort.RunOptions()
+        self.run_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", shrink_devices)
+        if self.graph_capture:
+            # Graph id -1 runs without capture/replay, for callers whose shapes vary
+            self.run_options.add_run_config_entry("gpu_graph_id", "-1")
+        self._next_graph_id = 1
+        
+        # One CPU arena shared by every session (opted into via session.use_env_allocators)
+        cpu_memory = self.ort.OrtMemoryInfo(
+            "Cpu", self.ort.OrtAllocatorType.ORT_ARENA_ALLOCATOR, 0, self.ort.OrtMemType.DEFAULT
+        )
+        self.ort.create_and_register_allocator(cpu_memory, None)
+        
         logger.info(f"Execution providers: {providers}")
     
+    @classmethod
+    def session_options(cls):
+        """New SessionOptions valid in this process; build every session through this"""
+        import onnxruntime as ort
+        session_options = ort.SessionOptions()
+        if cls._global_pool_ready:
+            # Once the process-wide pools exist ORT rejects sessions with their own threads
+            session_options.use_per_session_threads = False
+        return session_options
+    
+    def _providers_for(self, model_name: str, graph_capture: bool = True) -> List:
+        """Execution providers for one model (Vitis AI caches compiled graphs per model)"""
+        if not self.npu_provider and (graph_capture or not self.graph_capture):
+            return self.execution_providers
+        
+        providers = list(self.execution_providers)
+        if self.npu_provider:
+            name, options = providers[0]
+            providers[0] = (name, {**options, 'cacheKey': model_name})
+        if not graph_capture:
+            providers = [
+                (p[0], {k: v for k, v in p[1].items() if k not in ('enable_cuda_graph', 'enable_hip_graph')})
+                if isinstance(p, tuple) else p
+                for p in providers
+            ]
+        return providers
+    
     def load_model(self, model_path: str, model_name: str = None) -> bool:
         """
         Load ONNX model for inference
@@ -82,31 +226,47 @@ class ONNXRuntimeManager:
             
             model_name = model_name or os.path.basename(model_path)
             
-            # Create session with optimizations
-            session_options = self.ort.SessionOptions()
-            session_options.optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-            session_options.intra_op_num_threads = 4
+            # Identical model bytes share one session whatever path or name they come from
+            digest = self._model_digest(model_path)
+            session = self._sessions_by_hash.get(digest)
+            if session is None:
+                session = self._create_session(model_path, model_name, digest)
+                self._sessions_by_hash[digest] = session
+            else:
+                logger.info(f"Reusing already loaded session for {model_name}")
+            self._ref[digest] += 1
             
-            # Load model
-            session = self.ort.InferenceSession(
+            # Store model info
+            inputs = session.get_inputs()
+            row = (
+                session,
+                digest,
                 model_path,
-                sess_options=session_options,
-                providers=self.execution_providers
+                tuple(input.name for input in inputs),
+                tuple(output.name for output in session.get_outputs()),
+                tuple(input.shape for input in inputs),
+                {input.name: ORT_TYPE_TO_NUMPY[input.type] for input in inputs if input.type in ORT_TYPE_TO_NUMPY},
             )
+            columns = (self._sessions, self._hashes, self._paths, self._input_names,
+                       self._output_names, self._input_shapes, self._input_dtypes)
             
-            self.sessions[model_name] = session
-            
-            # Store model info
-            self.model_info[model_name] = {
-                "path": model_path,
-                "input_names": [input.name for input in session.get_inputs()],
-                "output_names": [output.name for output in session.get_outputs()],
-                "input_shape": [input.shape for input in session.get_inputs()],
-            }
+            mid = self._mid.get(model_name)
+            if mid is None:
+                self._mid[model_name] = len(self._names)
+                self._names.append(model_name)
+                for column, value in zip(columns, row):
+                    column.append(value)
+                self._names_view = tuple(self._names)
+            else:
+                previous = self._hashes[mid]
+                for column, value in zip(columns, row):
+                    column[mid] = value
+                self._purge_bindings(model_name)
+                self._release_session(previous)
             
             logger.info(f"Model loaded successfully: {model_name}")
-            logger.debug(f"  Inputs: {self.model_info[model_name]['input_names']}")
-            logger.debug(f"  Outputs: {self.model_info[model_name]['output_names']}")
+            logger.debug(f"  Inputs: {list(row[3])}")
+            logger.debug(f"  Outputs: {list(row[4])}")
             
             return True
         
@@ -114,39 +274,255 @@ class ONNXRuntimeManager:
             logger.error(f"Error loading model {model_path}: {e}")
             return False
     
-    def infer(self, model_name: str, input_data: Dict[str, np.ndarray]) -> Optional[Dict]:
+    def _create_session(self, model_path: str, model_name: str, digest: str):
+        """Build an optimized InferenceSession for a model file"""
+        # Create session with optimizations; with the shared pools active, thread
+        # counts come from the process-wide pools set in _setup_providers
+        session_options = self.session_options()
+        session_options.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if not self.global_thread_pool:
+            # Accelerated sessions use one CPU thread to avoid contending with other
+            # models; CPU sessions split the physical cores across loaded models
+            if self.gpu_provider or self.npu_provider:
+                intra_threads = 1
+            else:
+                intra_threads = max(1, self.physical_cores // (len(self._sessions_by_hash) + 1))
+            session_options.intra_op_num_threads = HARDWARE_CONFIG['intra_op_num_threads'] or intra_threads
+        if self._sessions_by_hash:
+            session_options.execution_mode = self.ort.ExecutionMode.ORT_PARALLEL
+            if not self.global_thread_pool:
+                session_options.inter_op_num_threads = HARDWARE_CONFIG['inter_op_num_threads'] or 2
+        # Keep weights in EP-native memory instead of staging through the CPU arena
+        session_options.add_session_config_entry("session.use_device_allocator_for_initializers", "1")
+        # Share the process-wide CPU arena registered in _setup_providers
+        session_options.add_session_config_entry("session.use_env_allocators", "1")
+        
+        providers = self._providers_for(model_name)
+        provider_names = [p[0] if isinstance(p, tuple) else p for p in providers]
+        
+        # Reuse the optimized graph baked by an earlier load, or bake it now. Only
+        # CPU-only sessions bake: graphs holding compiled/fused EP nodes (Vitis AI,
+        # DirectML, graph-captured GPU) cannot be serialized. Baked graphs are specific
+        # to the ORT version and host, so both key the cache next to the model hash
+        opt_cache = None
+        if provider_names == ['CPUExecutionProvider']:
+            opt_cache = self._opt_cache_path(digest)
+        if opt_cache is None:
+            session_source = model_path
+        elif os.path.exists(opt_cache):
+            session_source = opt_cache
+            session_options.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            logger.debug(f"Using cached optimized graph: {opt_cache}")
+        else:
+            session_source = model_path
+            session_options.optimized_model_filepath = opt_cache
+            # Large initializers go to a side file written once with the optimized graph;
+            # named after the cache so it never clobbers externalize_weights() output
+            session_options.add_session_config_entry(
+                "session.optimized_model_external_initializers_file_name",
+                os.path.basename(opt_cache) + ".weights"
+            )
+            session_options.add_session_config_entry(
+                "session.optimized_model_external_initializers_min_size_in_bytes", "1024"
+            )
+        
+        # Load by path: ORT memory-maps external-data weight files itself,
+        # so models saved with externalize_weights() page weights in lazily
+        try:
+            session = self.ort.InferenceSession(
+                session_source,
+                sess_options=session_options,
+                providers=providers
+            )
+        except Exception as e:
+            if session_options.optimized_model_filepath:
+                # Baking is only a speed-up; load without it if the cache cannot be written
+                logger.warning(f"Could not cache optimized graph for {model_name}: {e}")
+                session_options.optimized_model_filepath = ""
+                return self.ort.InferenceSession(
+                    session_source,
+                    sess_options=session_options,
+                    providers=providers
+                )
+            if not self.graph_capture:
+                raise
+            # Capture needs every node on the GPU EP; load such models without it
+            logger.warning(f"GPU graph capture unavailable for {model_name}: {e}")
+            session = self.ort.InferenceSession(
+                session_source,
+                sess_options=session_options,
+                providers=self._providers_for(model_name, graph_capture=False)
+            )
+        return session
+    
+    def _opt_cache_path(self, digest: str) -> Optional[str]:
+        """Cache file for a model's optimized CPU graph, or None if the cache dir is unusable"""
+        cache_dir = CACHE_DIR / "ort_opt"
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.debug(f"Optimized graph cache unavailable: {e}")
+            return None
+        return str(cache_dir / f"{digest}.ort-{self.ort.__version__}.{platform.machine()}.cpu.onnx")
+    
+    @staticmethod
+    def _model_digest(model_path: str) -> str:
+        """Content hash of a model file and its externalized weights, if any"""
+        try:
+            import xxhash
+            hasher = xxhash.xxh3_128()
+        except ImportError:
+            hasher = hashlib.blake2b(digest_size=16)
+        
+        for path in (model_path, model_path + ".weights"):
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        return hasher.hexdigest()
+    
+    def _release_session(self, digest: str):
+        """Drop one reference to a shared session, freeing it at zero"""
+        self._ref[digest] -= 1
+        if self._ref[digest] <= 0:
+            del self._ref[digest]
+            del self._sessions_by_hash[digest]
+    
+    def infer(self, model_name: str, input_data: Dict[str, np.ndarray],
+              as_dict: bool = False) -> Optional[Union[List[np.ndarray], Dict]]:
         """
         Run inference on loaded model
         
         Args:
             model_name: Name of loaded model
             input_data: Input data dictionary {input_name: numpy_array}
+            as_dict: Map outputs to their names instead of returning them positionally
         
         Returns:
-            Output dictionary or None if error
+            List of outputs (or output dictionary if as_dict) or None if error
         """
         try:
-            if model_name not in self.sessions:
+            mid = self._mid.get(model_name)
+            if mid is None:
                 logger.error(f"Model not found: {model_name}")
                 return None
             
-            session = self.sessions[model_name]
-            outputs = session.run(None, input_data)
+            input_data = self._cast_inputs(mid, input_data)
+            outputs = self._sessions[mid].run(None, input_data, run_options=self.run_options)
             
-            # Map outputs to names
-            output_names = self.model_info[model_name]['output_names']
-            output_dict = {name: output for name, output in zip(output_names, outputs)}
-            
-            return output_dict
+            if as_dict:
+                return dict(zip(self._output_names[mid], outputs))
+            return outputs
         
         except Exception as e:
             logger.error(f"Error during inference: {e}")
             return None
     
+    def _cast_inputs(self, mid: int, input_data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Cast inputs to the dtypes the model expects; the caller's dict is left untouched"""
+        expected_dtypes = self._input_dtypes[mid]
+        cast_data = None
+        for name, arr in input_data.items():
+            expected = expected_dtypes.get(name)
+            if expected is None or getattr(arr, "dtype", None) == expected:
+                continue
+            
+            warn_key = (self._names[mid], name, str(getattr(arr, "dtype", type(arr).__name__)))
+            if warn_key not in self._dtype_warnings:
+                self._dtype_warnings.add(warn_key)
+                logger.warning(f"Input '{name}' for {warn_key[0]} is {warn_key[2]}, expected {expected}; "
+                              f"casting on every call - convert upstream")
+            
+            if cast_data is None:
+                cast_data = dict(input_data)
+            cast_data[name] = np.ascontiguousarray(arr, dtype=expected)
+        
+        return input_data if cast_data is None else cast_data
+    
+    def infer_bound(self, model_name: str, input_data: Dict[str, np.ndarray]) -> Optional[Dict]:
+        """
+        Run inference through a cached IOBinding with pre-allocated buffers
+        
+        The first call for a given input signature allocates device buffers for
+        every input and output; later calls copy into them in place, avoiding
+        per-call OrtValue wrapping and output allocation. With GPU graph capture
+        each signature gets its own graph id, so its first run is captured and
+        later runs replay the recorded kernel launches.
+        
+        Args:
+            model_name: Name of loaded model
+            input_data: Input data dictionary {input_name: numpy_array}
+        
+        Returns:
+            Output dictionary or None if error; on CPU the arrays are views of the
+            cached output buffers, overwritten by the next call with the same signature
+        """
+        try:
+            mid = self._mid.get(model_name)
+            if mid is None:
+                logger.error(f"Model not found: {model_name}")
+                return None
+            
+            session = self._sessions[mid]
+            # Buffers are typed, so bind what infer() would feed the session;
+            # the key then carries the dtype actually bound
+            input_data = self._cast_inputs(mid, input_data)
+            key = (model_name, tuple(
+                (name, arr.shape, arr.dtype.str) for name, arr in sorted(input_data.items())
+            ))
+            
+            binding = self._binding_cache.get(key)
+            if binding is None:
+                binding = self._create_binding(mid, input_data)
+                self._binding_cache[key] = binding
+            io_binding, input_values, output_values, run_options = binding
+            
+            for name, arr in input_data.items():
+                input_values[name].update_inplace(np.ascontiguousarray(arr))
+            
+            session.run_with_iobinding(io_binding, run_options)
+            return {name: value.numpy() for name, value in output_values.items()}
+        
+        except Exception as e:
+            logger.error(f"Error during bound inference: {e}")
+            return None
+    
+    def _create_binding(self, mid: int, input_data: Dict[str, np.ndarray]) -> Tuple:
+        """Allocate an IOBinding and device buffers for one input signature"""
+        session = self._sessions[mid]
+        device = self.binding_device
+        io_binding = session.io_binding()
+        
+        input_values = {}
+        for name, arr in input_data.items():
+            value = self.ort.OrtValue.ortvalue_from_shape_and_type(arr.shape, arr.dtype.type, device, 0)
+            io_binding.bind_ortvalue_input(name, value)
+            input_values[name] = value
+        
+        # One regular run tells us the output shapes for this input signature
+        outputs = session.run(None, input_data, run_options=self.run_options)
+        output_values = {}
+        for name, out in zip(self._output_names[mid], outputs):
+            value = self.ort.OrtValue.ortvalue_from_shape_and_type(out.shape, out.dtype.type, device, 0)
+            io_binding.bind_ortvalue_output(name, value)
+            output_values[name] = value
+        
+        run_options = self.run_options
+        if self.graph_capture:
+            # Buffers stay at fixed addresses, as graph replay requires
+            run_options = self.ort.RunOptions()
+            run_options.add_run_config_entry("gpu_graph_id", str(self._next_graph_id))
+            self._next_graph_id += 1
+        
+        return io_binding, input_values, output_values, run_options
+    
     def batch_infer(self, model_name: str, batch_inputs: List[Dict]) -> Optional[List[Dict]]:
         """
         Run batch inference
         
+        Inputs sharing the same input names are stacked along axis 0 and run
+        in a single session call; ragged groups fall back to per-sample runs.
+        
         Args:
             model_name: Name of loaded model
             batch_inputs: List of input dictionaries
@@ -155,50 +531,189 @@ class ONNXRuntimeManager:
             List of output dictionaries
         """
         try:
-            results = []
-            for input_data in batch_inputs:
-                result = self.infer(model_name, input_data)
-                if result:
-                    results.append(result)
+            mid = self._mid.get(model_name)
+            if mid is None:
+                logger.error(f"Model not found: {model_name}")
+                return None
+            
+            # Group sample indices by input-name set
+            groups = {}
+            for index, input_data in enumerate(batch_inputs):
+                groups.setdefault(frozenset(input_data), []).append(index)
+            
+            session = self._sessions[mid]
+            output_names = self._output_names[mid]
+            run_options = self.run_options
             
+            results = [None] * len(batch_inputs)
+            for indices in groups.values():
+                group = [batch_inputs[i] for i in indices]
+                outputs = self._run_stacked(mid, group)
+                if outputs is None:
+                    outputs = []
+                    for input_data in group:
+                        try:
+                            sample = self._cast_inputs(mid, input_data)
+                            outputs.append(dict(zip(output_names, session.run(None, sample, run_options=run_options))))
+                        except Exception as e:
+                            logger.error(f"Error during inference: {e}")
+                            outputs.append(None)
+                for i, output in zip(indices, outputs):
+                    results[i] = output
+            
+            results = [result for result in results if result]
             return results if results else None
         
         except Exception as e:
             logger.error(f"Error during batch inference: {e}")
             return None
     
+    def _run_stacked(self, mid: int, group: List[Dict]) -> Optional[List[Dict]]:
+        """Run a group of same-schema inputs as one batch; None if it cannot be stacked"""
+        # Only a symbolic (or unknown) leading dimension can take the concatenated batch
+        for shape in self._input_shapes[mid]:
+            if shape and isinstance(shape[0], int):
+                return None
+        
+        first = group[0]
+        for name, arr in first.items():
+            if np.ndim(arr) == 0:
+                return None
+            for input_data in group[1:]:
+                other = input_data[name]
+                if np.ndim(other) == 0 or other.shape[1:] != arr.shape[1:] or other.dtype != arr.dtype:
+                    return None
+        
+        sizes = [len(next(iter(input_data.values()))) for input_data in group]
+        for input_data, size in zip(group, sizes):
+            if any(len(arr) != size for arr in input_data.values()):
+                return None
+        
+        stacked = {
+            name: np.ascontiguousarray(np.concatenate([d[name] for d in group], axis=0))
+            for name in first
+        }
+        try:
+            outputs = self._sessions[mid].run(None, self._cast_inputs(mid, stacked), run_options=self.run_options)
+        except Exception as e:
+            # Shapes the session still rejects fall back to per-sample runs
+            logger.debug(f"Stacked run failed, running samples one by one: {e}")
+            return None
+        
+        # Every output must carry the batch dimension to be split back per sample
+        total = sum(sizes)
+        if any(np.ndim(out) == 0 or len(out) != total for out in outputs):
+            return None
+        
+        split_points = np.cumsum(sizes)[:-1]
+        output_names = self._output_names[mid]
+        per_output = [np.split(out, split_points) for out in outputs]
+        return [
+            {name: parts[i] for name, parts in zip(output_names, per_output)}
+            for i in range(len(group))
+        ]
+    
+    @property
+    def sessions(self) -> Dict:
+        """Loaded sessions keyed by model name"""
+        return dict(zip(self._names, self._sessions))
+    
+    @property
+    def model_info(self) -> Dict[str, Dict]:
+        """Information about every loaded model keyed by model name"""
+        return {name: self.get_model_info(name) for name in self._names}
+    
     def get_model_info(self, model_name: str) -> Optional[Dict]:
         """Get information about loaded model"""
-        return self.model_info.get(model_name)
+        mid = self._mid.get(model_name)
+        if mid is None:
+            return None
+        return {
+            "path": self._paths[mid],
+            "input_names": list(self._input_names[mid]),
+            "output_names": list(self._output_names[mid]),
+            "input_shape": list(self._input_shapes[mid]),
+            "input_dtypes": dict(self._input_dtypes[mid]),
+        }
     
-    def list_models(self) -> List[str]:
+    def list_models(self) -> Tuple[str, ...]:
         """List all loaded models"""
-        return list(self.sessions.keys())
+        return self._names_view
+    
+    def _purge_bindings(self, model_name: str):
+        """Drop cached IOBindings that belong to a model"""
+        for key in [k for k in self._binding_cache if k[0] == model_name]:
+            del self._binding_cache[key]
     
     def unload_model(self, model_name: str) -> bool:
         """Unload a model to free memory"""
         try:
-            if model_name in self.sessions:
-                del self.sessions[model_name]
-                del self.model_info[model_name]
-                logger.info(f"Model unloaded: {model_name}")
-                return True
-            return False
+            mid = self._mid.pop(model_name, None)
+            if mid is None:
+                return False
+            
+            # Move the last row into the freed slot so the columns stay dense
+            last = len(self._names) - 1
+            digest = self._hashes[mid]
+            for column in (self._names, self._sessions, self._hashes, self._paths, self._input_names,
+                           self._output_names, self._input_shapes, self._input_dtypes):
+                column[mid] = column[last]
+                column.pop()
+            if mid != last:
+                self._mid[self._names[mid]] = mid
+            self._names_view = tuple(self._names)
+            
+            self._purge_bindings(model_name)
+            self._release_session(digest)
+            logger.info(f"Model unloaded: {model_name}")
+            return True
         except Exception as e:
             logger.error(f"Error unloading model: {e}")
             return False
 
+class NpzCalibrationDataReader:
+    """Feeds calibration samples from an .npz file to ORT static quantization"""
+    
+    def __init__(self, calib_npz: str, max_samples: int = 500):
+        """
+        Args:
+            calib_npz: .npz file keyed by model input name, samples on axis 0
+            max_samples: Maximum number of samples to yield
+        """
+        with np.load(calib_npz) as data:
+            self.inputs = {name: data[name] for name in data.files}
+        
+        num_samples = min(len(arr) for arr in self.inputs.values()) if self.inputs else 0
+        self.num_samples = min(num_samples, max_samples)
+        self._index = 0
+    
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        """Return the next single-sample input dict, or None when exhausted"""
+        if self._index >= self.num_samples:
+            return None
+        i = self._index
+        self._index += 1
+        return {name: arr[i:i + 1] for name, arr in self.inputs.items()}
+    
+    def rewind(self):
+        """Restart iteration from the first sample"""
+        self._index = 0
+
 class ModelOptimizer:
     """Optimize models for lightweight inference on AMD hardware"""
     
     @staticmethod
-    def quantize_model(model_path: str, quantization_type: str = "int8") -> Optional[str]:
+    def quantize_model(model_path: str, quantization_type: str = "int8",
+                       op_types_to_quantize: Optional[List[str]] = None,
+                       reduce_range: bool = False) -> Optional[str]:
         """
         Quantize model for faster inference with reduced memory
         
         Args:
             model_path: Path to ONNX model
             quantization_type: Type of quantization ('int8', 'float16')
+            op_types_to_quantize: Node types to quantize for int8 (default: MatMul/Gemm/Conv)
+            reduce_range: Use 7-bit weights; only needed on CPUs without VNNI
         
         Returns:
             Path to quantized model or None
@@ -206,10 +721,32 @@ class ModelOptimizer:
         try:
             logger.info(f"Quantizing model: {model_path} to {quantization_type}")
             
-            # Placeholder for actual quantization logic
-            # In production, use onnx-simplifier and quantization tools
             quantized_path = model_path.replace('.onnx', f'_quantized_{quantization_type}.onnx')
             
+            if quantization_type == "int8":
+                # Dynamic quantization: int8 weights, activations quantized per batch
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(
+                    model_input=model_path,
+                    model_output=quantized_path,
+                    op_types_to_quantize=list(op_types_to_quantize or QUANTIZABLE_OP_TYPES),
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                    reduce_range=reduce_range
+                )
+            elif quantization_type == "float16":
+                import onnx
+                from onnxruntime.transformers.float16 import convert_float_to_float16, DEFAULT_OP_BLOCK_LIST
+                model = convert_float_to_float16(
+                    onnx.load(model_path),
+                    keep_io_types=True,
+                    op_block_list=list(DEFAULT_OP_BLOCK_LIST) + list(FP16_OP_BLOCK_LIST)
+                )
+                onnx.save(model, quantized_path)
+            else:
+                logger.error(f"Unsupported quantization type: {quantization_type}")
+                return None
+            
             logger.info(f"Model quantized successfully: {quantized_path}")
             return quantized_path
         
@@ -217,11 +754,65 @@ class ModelOptimizer:
             logger.error(f"Error quantizing model: {e}")
             return None
     
+    @staticmethod
+    def static_quantize(model_path: str, calib_npz: str, for_npu: bool = False,
+                        max_samples: int = 500) -> Optional[str]:
+        """
+        Statically quantize model to int8 QDQ using calibration data
+        
+        Args:
+            model_path: Path to ONNX model
+            calib_npz: .npz file with one array per model input, samples on axis 0
+            for_npu: Use symmetric weights so the Ryzen AI NPU (VitisAI EP) can fuse int8 kernels
+            max_samples: Maximum number of calibration samples to use
+        
+        Returns:
+            Path to quantized model or None
+        """
+        try:
+            logger.info(f"Static int8 quantization: {model_path} (calibration: {calib_npz})")
+            
+            if ONNXRuntimeManager._global_pool_ready:
+                # The calibrator builds its own SessionOptions, which the shared pool rejects
+                logger.error("Static quantization unavailable once share_thread_pool is active; "
+                             "run it in a separate process")
+                return None
+            
+            from onnxruntime.quantization import (
+                quantize_static, QuantType, QuantFormat, CalibrationMethod
+            )
+            
+            quantized_path = model_path.replace('.onnx', '_quantized_static_int8.onnx')
+            extra_options = {"WeightSymmetric": True, "ActivationSymmetric": False} if for_npu else {}
+            
+            quantize_static(
+                model_input=model_path,
+                model_output=quantized_path,
+                calibration_data_reader=NpzCalibrationDataReader(calib_npz, max_samples),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+                calibrate_method=CalibrationMethod.Entropy,
+                extra_options=extra_options
+            )
+            
+            logger.info(f"Model statically quantized: {quantized_path}")
+            return quantized_path
+        
+        except Exception as e:
+            logger.error(f"Error in static quantization: {e}")
+            return None
+    
     @staticmethod
     def optimize_for_inference(model_path: str) -> Optional[str]:
         """
         Optimize model for fast inference
         
+        Bakes ORT_ENABLE_ALL graph optimizations (fusion, constant folding,
+        layout transforms) into a new file so later loads skip that work.
+        The result targets the CPU execution provider it was optimized with.
+        
         Args:
             model_path: Path to ONNX model
         
@@ -231,9 +822,31 @@ class ModelOptimizer:
         try:
             logger.info(f"Optimizing model for inference: {model_path}")
             
-            # Placeholder for optimization
+            import onnxruntime as ort
+            
             optimized_path = model_path.replace('.onnx', '_optimized.onnx')
             
+            # Remove constant branches first when onnx-simplifier is available
+            model_source = model_path
+            try:
+                import onnx
+                from onnxsim import simplify
+                simplified, check_ok = simplify(onnx.load(model_path))
+                if check_ok:
+                    model_source = simplified.SerializeToString()
+            except ImportError:
+                logger.debug("onnxsim not installed, skipping graph simplification")
+            
+            # Session construction alone serializes the optimized graph
+            session_options = ONNXRuntimeManager.session_options()
+            session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session_options.optimized_model_filepath = optimized_path
+            ort.InferenceSession(model_source, session_options, providers=["CPUExecutionProvider"])
+            
+            if not os.path.exists(optimized_path):
+                logger.error(f"Optimized model was not written: {optimized_path}")
+                return None
+            
             logger.info(f"Model optimized: {optimized_path}")
             return optimized_path
         
@@ -241,6 +854,52 @@ class ModelOptimizer:
             logger.error(f"Error optimizing model: {e}")
             return None
 
+    @staticmethod
+    def externalize_weights(model_path: str, size_threshold: int = 1024) -> Optional[str]:
+        """
+        Move model weights into a side file so sessions can memory-map them
+        
+        The graph stays in model_path; every tensor of at least size_threshold
+        bytes is written to <model>.weights next to it.
+        
+        Args:
+            model_path: Path to ONNX model (rewritten in place)
+            size_threshold: Minimum tensor size in bytes to externalize
+        
+        Returns:
+            Path to the weights file
+        """
+        try:
+            import onnx
+            from onnx.external_data_helper import convert_model_to_external_data
+            
+            logger.info(f"Externalizing weights: {model_path}")
+            
+            # Location is stored relative to the model file
+            location = os.path.basename(model_path) + ".weights"
+            weights_path = os.path.join(os.path.dirname(model_path), location)
+            
+            model = onnx.load(model_path)
+            # Appending to a stale weights file would corrupt the offsets
+            if os.path.exists(weights_path):
+                os.remove(weights_path)
+            convert_model_to_external_data(
+                model,
+                all_tensors_to_one_file=True,
+                location=location,
+                size_threshold=size_threshold
+            )
+            onnx.save_model(model, model_path, save_as_external_data=True,
+                            all_tensors_to_one_file=True, location=location,
+                            size_threshold=size_threshold)
+            
+            logger.info(f"Weights externalized: {weights_path}")
+            return weights_path
+        
+        except Exception as e:
+            logger.error(f"Error externalizing weights: {e}")
+            return None
+
 # Demo usage
 if __name__ == "__main__":
     manager = ONNXRuntimeManager(use_gpu=True)
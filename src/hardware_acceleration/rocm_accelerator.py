@@ -4,22 +4,49 @@ ROCm Accelerator for AMD Ryzen AI (GPU + NPU)
 Enables hardware-accelerated inference on AMD GPUs and NPUs
 """
 
+import os
 import time
+import functools
+import numpy as np
 from typing import Dict, Optional
-from config.settings import HARDWARE_CONFIG
+from config.settings import HARDWARE_CONFIG, MODELS_DIR
 from config.logger import SecurityLogger
 
 logger = SecurityLogger.get_logger(__name__)
 
+# The caching allocator reads this once, when CUDA/HIP is first initialised, so it
+# is set at import (before any torch.cuda call in this module); it has no effect if
+# the process already initialised the GPU elsewhere
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
+# ONNX tensor element types -> numpy dtypes for generated benchmark inputs
+_ORT_TYPE_TO_NUMPY = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int64)": np.int64,
+    "tensor(int32)": np.int32,
+    "tensor(int8)": np.int8,
+    "tensor(uint8)": np.uint8,
+    "tensor(bool)": np.bool_,
+}
+
 class ROCmAccelerator:
     """Manages ROCm acceleration for AMD hardware"""
     
+    # Availability probe result, shared by all instances (None = not probed yet)
+    _AVAIL: Optional[bool] = None
+    
     def __init__(self):
         """Initialize ROCm accelerator"""
-        self.is_available = self._check_rocm_availability()
+        if ROCmAccelerator._AVAIL is None:
+            ROCmAccelerator._AVAIL = self._check_rocm_availability()
+        self.is_available = ROCmAccelerator._AVAIL
         self.device_info = {}
         self.use_npu = HARDWARE_CONFIG.get('use_npu', True)
         self.use_gpu = HARDWARE_CONFIG.get('use_gpu', True)
+        self._make_amp_ctx = None  # Builds a fresh autocast context per decorated call
+        self.fp16_model_path = None
         
         if self.is_available:
             self._init_devices()
@@ -32,7 +59,19 @@ class ROCmAccelerator:
             import torch
             if hasattr(torch, 'version'):
                 logger.info(f"PyTorch available: {torch.__version__}")
-            return torch.cuda.is_available() or self._check_hip_available()
+            
+            # ROCm builds of PyTorch report a HIP version
+            if getattr(torch.version, 'hip', None):
+                return True
+            
+            # A visible GPU only counts if it is an AMD one (gfx* architecture)
+            if torch.cuda.is_available():
+                # CUDA builds fill gcnArchName with a placeholder, so check the prefix
+                arch = getattr(torch.cuda.get_device_properties(0), 'gcnArchName', '') or ''
+                if arch.startswith('gfx'):
+                    return True
+            
+            return self._check_hip_available()
         except ImportError:
             logger.warning("PyTorch not available, ROCm acceleration unavailable")
             return False
@@ -40,18 +79,33 @@ class ROCmAccelerator:
     def _check_hip_available(self) -> bool:
         """Check if HIP (AMD's CUDA equivalent) is available"""
         try:
-            import os
-            # Check for HIP installation
-            rocm_path = os.environ.get('ROCM_HOME', '/opt/rocm')
-            return os.path.exists(rocm_path)
-        except Exception:
+            import ctypes
+            # Loading the HIP runtime is a definitive probe, unlike path checks
+            ctypes.CDLL("libamdhip64.so")
+            return True
+        except OSError:
             return False
     
     def _init_devices(self):
         """Initialize available AMD devices"""
+        # MIOpen reads these when its first handle is created: pick conv kernels
+        # from a persistent per-user find-db instead of searching every process
+        os.environ.setdefault("MIOPEN_FIND_MODE", "FAST")
+        os.environ.setdefault("MIOPEN_FIND_ENFORCE", "SEARCH_DB_UPDATE")
+        os.environ.setdefault("MIOPEN_USER_DB_PATH", os.path.expanduser("~/.cache/miopen"))
+        
         try:
             import torch
             
+            # torch.backends.cudnn drives MIOpen on ROCm builds
+            if HARDWARE_CONFIG['stable_input_shapes']:
+                torch.backends.cudnn.benchmark = True
+            else:
+                torch.backends.cudnn.deterministic = False
+            # TF32 matmul/conv on hardware that supports it; a no-op elsewhere
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            
             if torch.cuda.is_available():
                 self.device_info['gpu_count'] = torch.cuda.device_count()
                 for i in range(torch.cuda.device_count()):
@@ -76,20 +130,29 @@ class ROCmAccelerator:
         """Get information about available devices"""
         return self.device_info
     
-    def optimize_tensor(self, tensor_size: int, dtype: str = "float32") -> Dict:
+    def optimize_tensor(self, tensor_size: int, dtype: str = "float32",
+                        data: Optional[np.ndarray] = None) -> Dict:
         """
         Optimize tensor for efficient GPU/NPU processing
         
+        Without data this only estimates memory use. With data the array is cast
+        to dtype (on the GPU via pinned memory when ROCm is usable, otherwise
+        with numpy); int8 uses a symmetric per-tensor scale with zero point 0,
+        so the original is recovered as tensor * scale.
+        
         Args:
-            tensor_size: Size of tensor
-            dtype: Data type (float32, float16, int8)
+            tensor_size: Size of tensor (ignored when data is given)
+            dtype: Data type (float32, float16, bfloat16, int8)
+            data: Optional array to cast
         
         Returns:
-            Optimization recommendations
+            Optimization recommendations, plus tensor/scale/zero_point when data is given
         """
         try:
             # Determine optimal memory allocation
-            dtype_bytes = {'float32': 4, 'float16': 2, 'int8': 1}
+            dtype_bytes = {'float32': 4, 'float16': 2, 'bfloat16': 2, 'int8': 1}
+            if data is not None:
+                tensor_size = data.size
             memory_needed = tensor_size * dtype_bytes.get(dtype, 4) / 1e6  # MB
             
             optimization = {
@@ -99,13 +162,19 @@ class ROCmAccelerator:
                 "optimization_applied": False
             }
             
+            if data is not None:
+                optimization.update(self._cast_tensor(data, dtype))
+                optimization['original_size_mb'] = data.nbytes / 1e6
+                optimization['optimized_size_mb'] = tensor_size * dtype_bytes.get(dtype, 4) / 1e6
+                optimization['optimization_applied'] = True
+            
             # Recommend quantization if size is large
-            if memory_needed > 100:
+            elif memory_needed > 100:
                 optimization['recommendation'] = "Consider quantization to int8"
                 optimization['optimized_size_mb'] = memory_needed / 4
                 optimization['optimization_applied'] = True
             
-            logger.info(f"Tensor optimization: {memory_needed:.2f}MB -> "
+            logger.info(f"Tensor optimization: {optimization['original_size_mb']:.2f}MB -> "
                        f"{optimization.get('optimized_size_mb', memory_needed):.2f}MB")
             
             return optimization
@@ -114,14 +183,43 @@ class ROCmAccelerator:
             logger.error(f"Error optimizing tensor: {e}")
             return {}
     
-    def benchmark_inference(self, model_name: str, input_size: int, iterations: int = 100) -> Dict:
+    def _cast_tensor(self, data: np.ndarray, dtype: str) -> Dict:
+        """Cast an array to dtype on the best device; int8 is scale-quantized"""
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        
+        if self.is_available and self.use_gpu:
+            import torch
+            if torch.cuda.is_available():
+                # Pinned host memory lets the copy to the GPU run asynchronously
+                source = torch.from_numpy(data).pin_memory().to(device="cuda", non_blocking=True)
+                if dtype == "int8":
+                    scale = float(source.abs().max()) / 127 or 1.0
+                    tensor = torch.round(source / scale).clamp(-128, 127).to(torch.int8)
+                    return {"tensor": tensor, "scale": scale, "zero_point": 0, "device": "gpu"}
+                torch_dtypes = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+                return {"tensor": source.to(torch_dtypes[dtype]), "scale": 1.0, "zero_point": 0, "device": "gpu"}
+        
+        if dtype == "int8":
+            scale = float(np.abs(data).max(initial=0.0)) / 127 or 1.0
+            tensor = np.clip(np.rint(data / scale), -128, 127).astype(np.int8)
+            return {"tensor": tensor, "scale": scale, "zero_point": 0, "device": "cpu"}
+        if dtype == "bfloat16":
+            # numpy has no bfloat16; float16 gives the same memory saving
+            logger.debug("bfloat16 needs the GPU path, casting to float16 instead")
+            dtype = "float16"
+        return {"tensor": data.astype(dtype), "scale": 1.0, "zero_point": 0, "device": "cpu"}
+    
+    def benchmark_inference(self, model_name: str, input_size: int, iterations: int = 100,
+                            session=None, warmup: int = 20) -> Dict:
         """
         Benchmark inference latency on available hardware
         
         Args:
-            model_name: Name of model
-            input_size: Input tensor size
+            model_name: Name of model (loaded from models/<model_name>.onnx if no session given)
+            input_size: Size used for dynamic non-batch input dimensions
             iterations: Number of iterations for benchmarking
+            session: Optional existing onnxruntime InferenceSession to benchmark
+            warmup: Untimed iterations run first to reach steady state
         
         Returns:
             Benchmark results
@@ -129,19 +227,70 @@ class ROCmAccelerator:
         try:
             logger.info(f"Benchmarking {model_name} - {iterations} iterations")
             
-            # Simulate benchmark
+            import onnxruntime as ort
+            from src.hardware_acceleration.onnx_runtime_manager import ONNXRuntimeManager
+            
+            if session is None:
+                model_path = MODELS_DIR / f"{model_name}.onnx"
+                if not model_path.exists():
+                    logger.warning(f"Model file not found for benchmark: {model_path}")
+                    return {}
+                session = ort.InferenceSession(str(model_path), ONNXRuntimeManager.session_options(),
+                                               providers=ort.get_available_providers())
+            
+            inputs = self._make_benchmark_inputs(session, input_size)
+            
+            # Release arena growth between iterations so we time the steady state
+            run_options = ort.RunOptions()
+            run_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", "cpu:0")
+            
+            for _ in range(warmup):
+                session.run(None, inputs, run_options=run_options)
+            
+            latencies = []
+            torch = None
+            if self.is_available and self.use_gpu:
+                import torch
+                if not torch.cuda.is_available():
+                    torch = None
+            
+            if torch is not None:
+                # GPU path: device-side events around each run
+                for _ in range(iterations):
+                    start = torch.cuda.Event(enable_timing=True)
+                    end = torch.cuda.Event(enable_timing=True)
+                    start.record()
+                    session.run(None, inputs, run_options=run_options)
+                    end.record()
+                    torch.cuda.synchronize()
+                    latencies.append(start.elapsed_time(end))
+            else:
+                # CPU path: wall-clock per iteration
+                for _ in range(iterations):
+                    t0 = time.perf_counter_ns()
+                    session.run(None, inputs, run_options=run_options)
+                    latencies.append((time.perf_counter_ns() - t0) / 1e6)
+            
+            lat = np.asarray(latencies)
+            avg_latency = float(lat.mean())
+            p50, p95, p99 = (float(v) for v in np.percentile(lat, [50, 95, 99]))
+            
             results = {
                 "model": model_name,
                 "iterations": iterations,
-                "avg_latency_ms": 150.0,  # Placeholder
-                "min_latency_ms": 120.0,
-                "max_latency_ms": 200.0,
-                "throughput_fps": 6.67,  # 1000/150
-                "device": "gpu" if self.use_gpu else "cpu",
+                "avg_latency_ms": avg_latency,
+                "min_latency_ms": float(lat.min()),
+                "max_latency_ms": float(lat.max()),
+                "p50_latency_ms": p50,
+                "p95_latency_ms": p95,
+                "p99_latency_ms": p99,
+                "throughput_fps": 1000.0 / avg_latency if avg_latency > 0 else 0.0,
+                "device": "gpu" if torch is not None else "cpu",
                 "npu_acceleration": self.use_npu,
             }
             
-            logger.info(f"Benchmark results: {results['avg_latency_ms']:.2f}ms avg latency")
+            logger.info(f"Benchmark results: {results['avg_latency_ms']:.2f}ms avg latency "
+                       f"(p99 {p99:.2f}ms)")
             
             return results
         
@@ -149,16 +298,78 @@ class ROCmAccelerator:
             logger.error(f"Error benchmarking: {e}")
             return {}
     
-    def enable_mixed_precision(self) -> bool:
-        """Enable mixed precision training/inference for faster computation"""
+    @staticmethod
+    def _make_benchmark_inputs(session, input_size: int) -> Dict[str, np.ndarray]:
+        """Build random inputs for a session (batch 1, dynamic dims = input_size)"""
+        inputs = {}
+        for model_input in session.get_inputs():
+            shape = [
+                dim if isinstance(dim, int) else (1 if i == 0 else input_size)
+                for i, dim in enumerate(model_input.shape)
+            ]
+            dtype = _ORT_TYPE_TO_NUMPY.get(model_input.type, np.float32)
+            inputs[model_input.name] = np.random.rand(*shape).astype(dtype)
+        return inputs
+    
+    def enable_mixed_precision(self, model_path: Optional[str] = None, manager=None,
+                               model_name: Optional[str] = None) -> bool:
+        """
+        Enable mixed precision training/inference for faster computation
+        
+        PyTorch code wrapped with `amp` runs under bfloat16 autocast on the GPU.
+        With model_path the ONNX model is converted to float16 (Softmax and
+        LayerNormalization stay float32) and, if an ONNXRuntimeManager is
+        given, loaded into it under model_name.
+        
+        Args:
+            model_path: Optional ONNX model to convert to float16
+            manager: Optional ONNXRuntimeManager to load the converted model into
+            model_name: Name for the reloaded model (default: converted file name)
+        
+        Returns:
+            True if mixed precision was enabled for at least one path
+        """
         try:
-            logger.info("Enabling mixed precision (float16 + float32)")
-            # Would actually set up mixed precision with PyTorch
-            return True
+            logger.info("Enabling mixed precision (bfloat16/float16 + float32)")
+            enabled = False
+            
+            if self.is_available and self.use_gpu:
+                import torch
+                if torch.cuda.is_available():
+                    # MFMA/WMMA units run bfloat16 matmuls at about twice the fp32 rate
+                    self._make_amp_ctx = functools.partial(
+                        torch.autocast, device_type="cuda", dtype=torch.bfloat16, enabled=True
+                    )
+                    enabled = True
+            
+            if model_path:
+                from src.hardware_acceleration.onnx_runtime_manager import ModelOptimizer
+                fp16_path = ModelOptimizer.quantize_model(model_path, "float16")
+                if fp16_path is None:
+                    return False
+                self.fp16_model_path = fp16_path
+                enabled = True
+                if manager is not None:
+                    enabled = manager.load_model(fp16_path, model_name)
+            
+            if not enabled:
+                logger.warning("Mixed precision not enabled: no GPU and no model to convert")
+            return enabled
         except Exception as e:
             logger.error(f"Error enabling mixed precision: {e}")
             return False
     
+    def amp(self, func):
+        """Decorator running func under the autocast settings chosen by enable_mixed_precision"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._make_amp_ctx is None:
+                return func(*args, **kwargs)
+            # Autocast keeps per-entry state, so nested or concurrent calls each need their own
+            with self._make_amp_ctx():
+                return func(*args, **kwargs)
+        return wrapper
+    
     def get_memory_info(self) -> Dict:
         """Get GPU/NPU memory information"""
         try:
@@ -183,10 +394,35 @@ class ROCmAccelerator:
             return {}
     
     def allocate_memory_pool(self, size_mb: int) -> bool:
-        """Pre-allocate memory pool for faster inference"""
+        """
+        Pre-allocate memory pool for faster inference
+        
+        Reserves `size_mb` in PyTorch's caching allocator so later inference
+        allocations are served from the cache instead of hipMalloc/cudaMalloc.
+        This is a warm-up, not a pinned pool: torch.cuda.empty_cache() (or
+        allocator pressure) hands the segment back to the driver. ORT sessions
+        are not affected; ONNXRuntimeManager takes its GPU arena cap from
+        HARDWARE_CONFIG['gpu_mem_limit_mb'].
+        """
         try:
             logger.info(f"Allocating {size_mb}MB memory pool")
-            # Placeholder for actual memory allocation
+            
+            if not (self.is_available and self.use_gpu):
+                logger.warning("GPU not available, skipping memory pool allocation")
+                return False
+            
+            import torch
+            if not torch.cuda.is_available():
+                return False
+            
+            # torch.cuda.* maps to HIP on ROCm builds of PyTorch
+            size_bytes = size_mb * 1024 * 1024
+            stream = torch.cuda.current_stream()
+            block = torch.cuda.caching_allocator_alloc(size_bytes, device=0, stream=stream)
+            # Hand the block back to the cache: the segment stays reserved for reuse
+            torch.cuda.caching_allocator_delete(block)
+            
+            logger.info(f"Memory pool reserved: {torch.cuda.memory_reserved(0) / 1e6:.1f}MB")
             return True
         except Exception as e:
             logger.error(f"Error allocating memory: {e}")
@@ -227,12 +463,20 @@ class NPUOptimizer:
         except Exception:
             return False
     
-    def optimize_for_npu(self, model_path: str) -> Dict:
+    def optimize_for_npu(self, model_path: str, calib_npz: Optional[str] = None,
+                         max_samples: int = 100, benchmark_iterations: int = 50) -> Dict:
         """
         Optimize model specifically for NPU execution
         
+        Pins every dynamic dimension to 1 (the NPU runs batch-1), upgrades the
+        graph to opset 19, statically quantizes it to int8 QDQ and benchmarks
+        the result on the VitisAI EP when present, CPU otherwise.
+        
         Args:
             model_path: Path to model
+            calib_npz: .npz file with one array per model input, samples on axis 0
+            max_samples: Maximum number of calibration samples to use
+            benchmark_iterations: Timed iterations for the latency estimate
         
         Returns:
             Optimization configuration
@@ -242,13 +486,110 @@ class NPUOptimizer:
             "target": "npu",
             "quantization": "int8",  # NPU prefers int8
             "batch_size": 1,  # NPU typically works with batch size 1
-            "optimization_enabled": self.npu_available,
-            "expected_latency_ms": 50,  # NPU can be very fast
+            "optimization_enabled": False,
+            "quantized_model": None,
+            "quantizer": None,
+            "provider": None,
+            "expected_latency_ms": None,
         }
         
+        try:
+            if not os.path.exists(model_path):
+                logger.warning(f"Model file not found for NPU optimization: {model_path}")
+                return optimization
+            if not calib_npz:
+                logger.warning("NPU optimization needs calibration data (calib_npz), skipping")
+                return optimization
+            
+            pinned_path = self._pin_batch_one(model_path)
+            quantized_path = model_path.replace('.onnx', '_npu_int8.onnx')
+            optimization["quantizer"] = self._quantize_int8(pinned_path, quantized_path, calib_npz, max_samples)
+            optimization["quantized_model"] = quantized_path
+            optimization["optimization_enabled"] = True
+            
+            import onnxruntime as ort
+            from src.hardware_acceleration.onnx_runtime_manager import ONNXRuntimeManager
+            if "VitisAIExecutionProvider" in ort.get_available_providers():
+                providers = ["VitisAIExecutionProvider", "CPUExecutionProvider"]
+            else:
+                providers = ["CPUExecutionProvider"]
+            optimization["provider"] = providers[0]
+            
+            session = ort.InferenceSession(quantized_path, ONNXRuntimeManager.session_options(),
+                                           providers=providers)
+            bench = ROCmAccelerator().benchmark_inference(
+                os.path.basename(quantized_path), 1, iterations=benchmark_iterations, session=session
+            )
+            optimization["expected_latency_ms"] = bench.get("avg_latency_ms")
+        
+        except Exception as e:
+            logger.error(f"Error optimizing for NPU: {e}")
+        
         logger.info(f"NPU optimization: {optimization}")
         return optimization
     
+    @staticmethod
+    def _pin_batch_one(model_path: str, opset: int = 19) -> str:
+        """Write a copy of the model with dynamic dims fixed to 1 and opset >= 19"""
+        import onnx
+        from onnx import version_converter
+        
+        model = onnx.load(model_path)
+        for value in list(model.graph.input) + list(model.graph.output):
+            for dim in value.type.tensor_type.shape.dim:
+                if not dim.HasField("dim_value"):
+                    dim.Clear()
+                    dim.dim_value = 1
+        
+        default_opset = next((o.version for o in model.opset_import if o.domain in ("", "ai.onnx")), opset)
+        if default_opset < opset:
+            model = version_converter.convert_version(model, opset)
+        
+        pinned_path = model_path.replace('.onnx', '_b1.onnx')
+        onnx.save(model, pinned_path)
+        # Propagate the now-static shapes through the graph for the quantizer
+        onnx.shape_inference.infer_shapes_path(pinned_path, pinned_path)
+        return pinned_path
+    
+    @staticmethod
+    def _quantize_int8(model_path: str, output_path: str, calib_npz: str, max_samples: int) -> str:
+        """Static int8 QDQ quantization via AMD Quark, or onnxruntime when Quark is absent"""
+        from src.hardware_acceleration.onnx_runtime_manager import (
+            QUANTIZABLE_OP_TYPES, NpzCalibrationDataReader, ONNXRuntimeManager
+        )
+        
+        if ONNXRuntimeManager._global_pool_ready:
+            # Calibration builds sessions with their own options, which the shared pool rejects
+            raise RuntimeError("int8 calibration unavailable once share_thread_pool is active; "
+                               "run it in a separate process")
+        
+        reader = NpzCalibrationDataReader(calib_npz, max_samples)
+        try:
+            from quark.onnx import ModelQuantizer
+            from quark.onnx.quantization.config import Config, get_default_config
+            
+            # XINT8: symmetric int8 with power-of-two scales, the XDNA NPU format
+            quantizer = ModelQuantizer(Config(global_quant_config=get_default_config("XINT8")))
+            quantizer.quantize_model(model_path, output_path, reader)
+            return "quark"
+        except ImportError:
+            logger.debug("AMD Quark not installed, using onnxruntime static quantization")
+        
+        from onnxruntime.quantization import quantize_static, QuantType, QuantFormat, CalibrationMethod
+        quantize_static(
+            model_input=model_path,
+            model_output=output_path,
+            calibration_data_reader=reader,
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=list(QUANTIZABLE_OP_TYPES),
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=False,
+            calibrate_method=CalibrationMethod.MinMax,
+            extra_options={"WeightSymmetric": True, "ActivationSymmetric": True}
+        )
+        return "onnxruntime"
+    
     def get_npu_info(self) -> Dict:
         """Get information about NPU capabilities"""
         return {
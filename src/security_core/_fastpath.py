@@ -0,0 +1,45 @@
+# src/security_core/_fastpath.py
+"""
+Numeric fast path for ThreatEngine scoring
+JIT-compiled with Numba when available, plain Python otherwise
+"""
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Severity codes returned by score(), same thresholds as Alert severity
+SEVERITY_LEVELS = ("low", "medium", "high", "critical")
+
+@njit("Tuple((float64, int64, float64))(float64, float64, float64, float64, float64)", cache=True)
+def score(conf_phish, conf_mal, conf_beh, t_start, t_now):
+    """
+    Combine detector confidences into one assessment
+    
+    Args:
+        conf_phish: Phishing confidence (0.0 if not detected)
+        conf_mal: Malware confidence (0.0 if not detected)
+        conf_beh: Behavioral anomaly confidence (0.0 if not detected)
+        t_start: Detection start time in seconds
+        t_now: Current time in seconds
+    
+    Returns:
+        (max_confidence, severity_code, latency_ms)
+    """
+    max_conf = max(conf_phish, max(conf_mal, conf_beh))
+    
+    if max_conf >= 0.85:
+        severity_code = 3
+    elif max_conf >= 0.65:
+        severity_code = 2
+    elif max_conf >= 0.45:
+        severity_code = 1
+    else:
+        severity_code = 0
+    
+    return max_conf, severity_code, (t_now - t_start) * 1000.0
@@ -4,25 +4,113 @@ Alert Manager
 Manages threat alerts, notifications, and user interactions
 """
 
+import io
+import csv
 import json
 import time
+import bisect
+import logging
+import itertools
+import numpy as np
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from config.settings import ALERT_CONFIG, DATABASE_CONFIG
 from config.logger import SecurityLogger
 
 logger = SecurityLogger.get_logger(__name__)
 
+try:
+    import orjson
+    
+    def _dumps(obj, pretty: bool = False) -> str:
+        """Serialize to JSON with orjson (indented only when pretty)"""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=str, option=option).decode()
+except ImportError:
+    def _dumps(obj, pretty: bool = False) -> str:
+        """Serialize to JSON with the stdlib (indented only when pretty)"""
+        return json.dumps(obj, indent=2 if pretty else None, default=str)
+
+class _LazyJson:
+    """Defers JSON serialization until a log record is actually formatted"""
+    
+    __slots__ = ("obj",)
+    
+    def __init__(self, obj):
+        self.obj = obj
+    
+    def __str__(self) -> str:
+        return _dumps(self.obj)
+
+# Alert ids are a per-process sequence behind the process start time, so ids
+# never collide and creating an alert needs no clock read for its id
+_ALERT_SEQ = itertools.count()
+_EPOCH_MS = int(time.time() * 1000)
+
+_NS_PER_DAY = 86400 * 10**9
+
+# Confidence thresholds and the severity each one starts
+_SEV_THRESH = (0.45, 0.65, 0.85)
+_SEV_NAMES = ("low", "medium", "high", "critical")
+_SEV_COLORS = {
+    "critical": "#FF0000",  # Red
+    "high": "#FFA500",      # Orange
+    "medium": "#FFFF00",    # Yellow
+    "low": "#0000FF"        # Blue
+}
+_SEV_COLOR_BY_CODE = tuple(_SEV_COLORS[name] for name in _SEV_NAMES)
+
+# UI tables shared by every formatted alert; action buttons are tuples so
+# callers get the same objects back instead of fresh lists
+_ICONS = {
+    "phishing": "🎣",
+    "malware": "🦠",
+    "behavioral": "⚠️",
+    "unknown": "❓"
+}
+_ACTIONS = {
+    "phishing": (
+        {"label": "Block", "action": "block", "color": "danger"},
+        {"label": "Report", "action": "report", "color": "warning"},
+        {"label": "Details", "action": "details", "color": "info"}
+    ),
+    "malware": (
+        {"label": "Quarantine", "action": "quarantine", "color": "danger"},
+        {"label": "Scan", "action": "scan", "color": "warning"},
+        {"label": "Details", "action": "details", "color": "info"}
+    ),
+    "behavioral": (
+        {"label": "Stop", "action": "stop", "color": "danger"},
+        {"label": "Monitor", "action": "monitor", "color": "warning"},
+        {"label": "Details", "action": "details", "color": "info"}
+    )
+}
+_DEFAULT_ACTIONS = (
+    {"label": "Dismiss", "action": "dismiss", "color": "secondary"},
+)
+
 class Alert:
     """Represents a single threat alert"""
     
+    # Alerts are retained for statistics, so skip the per-instance __dict__
+    __slots__ = (
+        "id", "ts_ns", "threat_type", "confidence", "severity", "user_message",
+        "details", "explanation", "is_dismissed", "actions_taken",
+        "_sev_idx", "_icon", "_color", "_actions",
+    )
+    
     def __init__(self, threat_data: Dict):
         """Initialize alert from threat data"""
         self.id = self._generate_id()
-        self.timestamp = datetime.now()
+        self.ts_ns = time.time_ns()
         self.threat_type = threat_data.get('threat_type', 'unknown')
         self.confidence = threat_data.get('confidence', 0.0)
-        self.severity = self._calculate_severity(threat_data.get('confidence', 0.0))
+        self._sev_idx = bisect.bisect_right(_SEV_THRESH, self.confidence)
+        self.severity = _SEV_NAMES[self._sev_idx]
+        # Resolved once here so UI formatting is plain attribute reads
+        self._icon = _ICONS.get(self.threat_type, "⚠️")
+        self._color = _SEV_COLOR_BY_CODE[self._sev_idx]
+        self._actions = _ACTIONS.get(self.threat_type, _DEFAULT_ACTIONS)
         self.user_message = threat_data.get('user_message', 'Security threat detected')
         self.details = threat_data.get('details', {})
         self.explanation = threat_data.get('explanation', {})
@@ -31,18 +119,12 @@ class Alert:
     
     def _generate_id(self) -> str:
         """Generate unique alert ID"""
-        return f"alert_{int(time.time()*1000)}"
-    
-    def _calculate_severity(self, confidence: float) -> str:
-        """Calculate alert severity"""
-        if confidence >= 0.85:
-            return "critical"
-        elif confidence >= 0.65:
-            return "high"
-        elif confidence >= 0.45:
-            return "medium"
-        else:
-            return "low"
+        return f"alert_{_EPOCH_MS}_{next(_ALERT_SEQ)}"
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Alert creation time, converted from epoch nanoseconds when read"""
+        return datetime.fromtimestamp(self.ts_ns / 1e9)
     
     def dismiss(self):
         """Dismiss the alert"""
@@ -76,6 +158,13 @@ class AlertManager:
     def __init__(self):
         """Initialize alert manager"""
         self.alerts: List[Alert] = []
+        self._alerts_by_id: Dict[str, Alert] = {}
+        # Per-alert metadata parallel to self.alerts, grown by doubling
+        self._ts_ns = np.empty(64, dtype=np.int64)
+        self._sev_codes = np.empty(64, dtype=np.uint8)
+        self._type_codes = np.empty(64, dtype=np.uint8)
+        self._type_names: List[str] = []  # type code -> threat type, in first-seen order
+        self._type_code: Dict[str, int] = {}
         self.alert_callbacks = []  # Callbacks for alert listeners
         self.alert_timeout = ALERT_CONFIG.get('alert_timeout_seconds', 10)
         self.auto_dismiss = ALERT_CONFIG.get('auto_dismiss', True)
@@ -95,7 +184,18 @@ class AlertManager:
         """
         try:
             alert = Alert(threat_data)
+            n = len(self.alerts)
+            if n == len(self._ts_ns):
+                self._grow()
+            type_code = self._type_code.get(alert.threat_type)
+            if type_code is None:
+                type_code = self._type_code[alert.threat_type] = len(self._type_names)
+                self._type_names.append(alert.threat_type)
+            self._ts_ns[n] = alert.ts_ns
+            self._sev_codes[n] = alert._sev_idx
+            self._type_codes[n] = type_code
             self.alerts.append(alert)
+            self._alerts_by_id[alert.id] = alert
             
             # Log alert
             self._log_alert(alert)
@@ -112,16 +212,20 @@ class AlertManager:
             logger.error(f"Error creating alert: {e}")
             return None
     
+    def _grow(self):
+        """Double the capacity of the per-alert metadata arrays"""
+        capacity = 2 * len(self._ts_ns)
+        self._ts_ns = np.resize(self._ts_ns, capacity)
+        self._sev_codes = np.resize(self._sev_codes, capacity)
+        self._type_codes = np.resize(self._type_codes, capacity)
+    
     def get_active_alerts(self) -> List[Alert]:
         """Get list of active (non-dismissed) alerts"""
         return [a for a in self.alerts if not a.is_dismissed]
     
     def get_alert_by_id(self, alert_id: str) -> Optional[Alert]:
         """Get alert by ID"""
-        for alert in self.alerts:
-            if alert.id == alert_id:
-                return alert
-        return None
+        return self._alerts_by_id.get(alert_id)
     
     def dismiss_alert(self, alert_id: str, reason: str = "") -> bool:
         """Dismiss an alert"""
@@ -158,66 +262,75 @@ class AlertManager:
     def _log_alert(self, alert: Alert):
         """Log alert to file"""
         try:
-            alert_dict = alert.to_dict()
+            # Skip building and serializing the dict when INFO is filtered out
+            if not logger.isEnabledFor(logging.INFO):
+                return
             # In production, this would write to a database
-            logger.info(f"Alert logged: {json.dumps(alert_dict)}")
+            logger.info("Alert logged: %s", _LazyJson(alert.to_dict()))
         except Exception as e:
             logger.error(f"Error logging alert: {e}")
     
     def get_alert_statistics(self) -> Dict:
         """Get alert statistics"""
-        active_alerts = self.get_active_alerts()
+        n = len(self.alerts)
+        # Read from the alerts themselves, which Alert.dismiss() may change directly
+        dismissed = sum(alert.is_dismissed for alert in self.alerts)
+        sev_counts = np.bincount(self._sev_codes[:n], minlength=len(_SEV_NAMES))
+        type_counts = np.bincount(self._type_codes[:n], minlength=len(self._type_names))
         
-        stats = {
-            "total_alerts": len(self.alerts),
-            "active_alerts": len(active_alerts),
-            "dismissed_alerts": len(self.alerts) - len(active_alerts),
-            "by_severity": {},
-            "by_type": {}
+        return {
+            "total_alerts": n,
+            "active_alerts": n - dismissed,
+            "dismissed_alerts": dismissed,
+            # Most severe first; types in the order they were first seen
+            "by_severity": {_SEV_NAMES[code]: int(sev_counts[code])
+                            for code in reversed(range(len(_SEV_NAMES))) if sev_counts[code]},
+            "by_type": {name: int(count)
+                        for name, count in zip(self._type_names, type_counts) if count}
         }
-        
-        for alert in self.alerts:
-            # Count by severity
-            severity = alert.severity
-            stats['by_severity'][severity] = stats['by_severity'].get(severity, 0) + 1
-            
-            # Count by type
-            threat_type = alert.threat_type
-            stats['by_type'][threat_type] = stats['by_type'].get(threat_type, 0) + 1
-        
-        return stats
     
     def export_alerts(self, format: str = "json") -> str:
         """Export alerts in specified format"""
         alerts_data = [alert.to_dict() for alert in self.alerts]
         
         if format == "json":
-            return json.dumps(alerts_data, indent=2, default=str)
+            return _dumps(alerts_data, pretty=True)
         elif format == "csv":
             # Simple CSV export
-            lines = ["ID,Type,Severity,Confidence,Timestamp,Dismissed"]
-            for alert in self.alerts:
-                lines.append(f"{alert.id},{alert.threat_type},{alert.severity},"
-                           f"{alert.confidence:.2f},{alert.timestamp},"
-                           f"{alert.is_dismissed}")
-            return "\n".join(lines)
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerow(("ID", "Type", "Severity", "Confidence", "Timestamp", "Dismissed"))
+            writer.writerows(
+                (alert.id, alert.threat_type, alert.severity, f"{alert.confidence:.2f}",
+                 alert.timestamp, alert.is_dismissed)
+                for alert in self.alerts
+            )
+            return buf.getvalue().rstrip("\n")
         else:
-            return json.dumps(alerts_data, indent=2, default=str)
+            return _dumps(alerts_data, pretty=True)
     
     def clear_alerts(self, days_old: int = 30):
         """Clear old alerts"""
-        cutoff_time = datetime.now().timestamp() - (days_old * 24 * 3600)
-        
-        alerts_to_remove = []
-        for alert in self.alerts:
-            if alert.timestamp.timestamp() < cutoff_time:
-                alerts_to_remove.append(alert)
+        cutoff_ns = time.time_ns() - days_old * _NS_PER_DAY
+        n = len(self.alerts)
         
-        for alert in alerts_to_remove:
-            self.alerts.remove(alert)
+        # Age mask rather than a sorted cut: wall-clock steps can leave the
+        # creation timestamps out of order
+        keep = self._ts_ns[:n] >= cutoff_ns
+        removed = n - int(np.count_nonzero(keep))
+        if removed:
+            kept = []
+            for alert, keep_alert in zip(self.alerts, keep.tolist()):
+                if keep_alert:
+                    kept.append(alert)
+                else:
+                    del self._alerts_by_id[alert.id]
+            self.alerts[:] = kept
+            for column in (self._ts_ns, self._sev_codes, self._type_codes):
+                column[:n - removed] = column[:n][keep]
         
-        logger.info(f"Cleared {len(alerts_to_remove)} old alerts")
-        return len(alerts_to_remove)
+        logger.info(f"Cleared {removed} old alerts")
+        return removed
 
 class AlertFormatter:
     """Formats alerts for different output formats"""
@@ -227,60 +340,29 @@ class AlertFormatter:
         """Format alert for UI display"""
         return {
             "id": alert.id,
-            "icon": AlertFormatter._get_icon(alert.threat_type),
+            "icon": alert._icon,
             "title": f"{alert.threat_type.title()} Threat Detected",
             "message": alert.user_message,
             "severity": alert.severity,
-            "color": AlertFormatter._get_color(alert.severity),
-            "action_buttons": AlertFormatter._get_actions(alert.threat_type),
+            "color": alert._color,
+            "action_buttons": alert._actions,
             "details": alert.explanation.get('user_friendly', '')
         }
     
     @staticmethod
     def _get_icon(threat_type: str) -> str:
         """Get appropriate icon for threat type"""
-        icons = {
-            "phishing": "🎣",
-            "malware": "🦠",
-            "behavioral": "⚠️",
-            "unknown": "❓"
-        }
-        return icons.get(threat_type, "⚠️")
+        return _ICONS.get(threat_type, "⚠️")
     
     @staticmethod
     def _get_color(severity: str) -> str:
         """Get color for severity level"""
-        colors = {
-            "critical": "#FF0000",  # Red
-            "high": "#FFA500",      # Orange
-            "medium": "#FFFF00",    # Yellow
-            "low": "#0000FF"        # Blue
-        }
-        return colors.get(severity, "#808080")
+        return _SEV_COLORS.get(severity, "#808080")
     
     @staticmethod
-    def _get_actions(threat_type: str) -> List[Dict]:
+    def _get_actions(threat_type: str) -> Tuple[Dict, ...]:
         """Get action buttons for threat type"""
-        actions = {
-            "phishing": [
-                {"label": "Block", "action": "block", "color": "danger"},
-                {"label": "Report", "action": "report", "color": "warning"},
-                {"label": "Details", "action": "details", "color": "info"}
-            ],
-            "malware": [
-                {"label": "Quarantine", "action": "quarantine", "color": "danger"},
-                {"label": "Scan", "action": "scan", "color": "warning"},
-                {"label": "Details", "action": "details", "color": "info"}
-            ],
-            "behavioral": [
-                {"label": "Stop", "action": "stop", "color": "danger"},
-                {"label": "Monitor", "action": "monitor", "color": "warning"},
-                {"label": "Details", "action": "details", "color": "info"}
-            ]
-        }
-        return actions.get(threat_type, [
-            {"label": "Dismiss", "action": "dismiss", "color": "secondary"}
-        ])
+        return _ACTIONS.get(threat_type, _DEFAULT_ACTIONS)
 
 # Demo usage
 if __name__ == "__main__":
@@ -4,19 +4,75 @@ Main Threat Detection Engine
 Orchestrates threat detection across all modules with sub-500ms latency
 """
 
+import copy
 import time
+import hashlib
 import threading
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from typing import Dict, List, Optional
-from queue import Queue
 from config.settings import DETECTION_CONFIG
 from config.logger import SecurityLogger
 from src.threat_detection.phishing_detector import PhishingDetector
 from src.threat_detection.malware_detector import MalwareDetector
 from src.threat_detection.behavior_analyzer import BehaviorAnalyzer, ActionCollector
 from src.explainability.threat_explainer import ThreatExplainer
+from src.security_core._fastpath import score, SEVERITY_LEVELS
 
 logger = SecurityLogger.get_logger(__name__)
 
+try:
+    import xxhash
+    
+    def _content_hash(data: bytes) -> int:
+        return xxhash.xxh64_intdigest(data)
+except ImportError:
+    def _content_hash(data: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+# Content key -> (detected threat type, result flag, statistics counter)
+_DETECTION_KINDS = {
+    "url": ("phishing", "is_phishing", "phishing_detected"),
+    "code": ("malware", "is_malicious", "malware_detected"),
+    "action": ("behavioral", "is_anomaly", "behavioral_anomalies"),
+}
+# Leave headroom inside the 500ms detection budget for scoring and explanation
+_MULTI_TIMEOUT_S = 0.4
+# Queued threats drained and detected together per worker wake-up
+_QUEUE_BATCH_SIZE = 32
+
+class _LatencyWindow:
+    """Fixed-size ring buffer of the most recent latencies (callers hold the stats lock)"""
+    
+    __slots__ = ("buf", "idx", "n")
+    
+    def __init__(self, size: int):
+        self.buf = np.zeros(size, dtype=np.float64)
+        self.idx = 0
+        self.n = 0
+    
+    def record(self, latency_ms: float):
+        """Overwrite the oldest slot with a new latency"""
+        i = self.idx
+        self.buf[i] = latency_ms
+        self.idx = (i + 1) % len(self.buf)
+        if self.n < len(self.buf):
+            self.n += 1
+    
+    def summary(self) -> Dict:
+        """Mean, extremes and p95 of the live window (empty when nothing recorded)"""
+        if not self.n:
+            return {}
+        window = self.buf[:self.n]
+        return {
+            "avg_latency_ms": float(window.mean()),
+            "max_latency_ms": float(window.max()),
+            "min_latency_ms": float(window.min()),
+            "p95_latency_ms": float(np.percentile(window, 95)),
+            "total_latencies_recorded": self.n,
+        }
+
 class ThreatEngine:
     """Main engine that coordinates all threat detection systems"""
     
@@ -34,12 +90,18 @@ class ThreatEngine:
         self.malware_detector = MalwareDetector()
         self.behavior_analyzer = BehaviorAnalyzer()
         self.action_collector = ActionCollector(self.behavior_analyzer)
-        self.threat_explainer = ThreatExplainer()
+        self.threat_explainer = ThreatExplainer.instance()
         
         # Async processing
-        self.threat_queue = Queue()
+        # deque.append/popleft are atomic, so producers never take a queue mutex;
+        # the event only wakes the worker when it has gone idle
+        self.threat_queue = deque(maxlen=DETECTION_CONFIG['engine']['queue_size'])
+        self._queue_ready = threading.Event()
         self.detection_thread = None
         self.is_running = False
+        self._shutdown = threading.Event()
+        self._pool = None  # Created on the first composite input
+        self._stats_lock = threading.Lock()
         
         # Statistics
         self.stats = {
@@ -48,11 +110,14 @@ class ThreatEngine:
             "malware_detected": 0,
             "behavioral_anomalies": 0,
             "avg_latency_ms": 0.0,
-            "latencies": []
         }
+        self._reset_latencies()
         
-        # Threat cache to prevent duplicate alerts
-        self.threat_cache = {}
+        # LRU of url/code assessments keyed on content hash, to skip repeat scans
+        self.threat_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_size = DETECTION_CONFIG['engine']['cache_size']
+        self._cache_ttl_ns = int(DETECTION_CONFIG['engine']['cache_ttl_seconds'] * 1e9)
         
         logger.info("ThreatEngine initialized")
     
@@ -60,6 +125,7 @@ class ThreatEngine:
         """Start the threat detection engine"""
         if self.enable_async and not self.is_running:
             self.is_running = True
+            self._shutdown.clear()
             self.detection_thread = threading.Thread(target=self._process_threats, daemon=True)
             self.detection_thread.start()
             logger.info("ThreatEngine started")
@@ -68,25 +134,30 @@ class ThreatEngine:
         """Stop the threat detection engine"""
         if self.is_running:
             self.is_running = False
+            self._shutdown.set()
+            self._queue_ready.set()
             if self.detection_thread:
                 self.detection_thread.join(timeout=2)
             logger.info("ThreatEngine stopped")
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
     
-    def detect_phishing(self, url: str, context: str = "") -> Dict:
+    def detect_phishing(self, url: str, context: str = "", record_latency: bool = True) -> Dict:
         """Detect phishing threats"""
         start_time = time.time()
         
         try:
-            result = self.phishing_detector.detect(url, context)
+            result = self.phishing_detector.safe_detect(url, context)
             
             if result['is_phishing']:
-                self.stats['phishing_detected'] += 1
+                self._increment_stats('phishing_detected')
                 result['threat_type'] = 'phishing'
             
             # Record latency
             latency_ms = (time.time() - start_time) * 1000
             result['latency_ms'] = latency_ms
-            self.stats['latencies'].append(latency_ms)
+            self._record_latency(latency_ms, 'phishing', overall=record_latency)
             
             return result
         
@@ -94,7 +165,7 @@ class ThreatEngine:
             logger.error(f"Error in phishing detection: {e}")
             return {"is_phishing": False, "error": str(e)}
     
-    def detect_malware(self, code: str, source_type: str = "script") -> Dict:
+    def detect_malware(self, code: str, source_type: str = "script", record_latency: bool = True) -> Dict:
         """Detect malware threats"""
         start_time = time.time()
         
@@ -102,13 +173,13 @@ class ThreatEngine:
             result = self.malware_detector.detect(code, source_type)
             
             if result['is_malicious']:
-                self.stats['malware_detected'] += 1
+                self._increment_stats('malware_detected')
                 result['threat_type'] = 'malware'
             
             # Record latency
             latency_ms = (time.time() - start_time) * 1000
             result['latency_ms'] = latency_ms
-            self.stats['latencies'].append(latency_ms)
+            self._record_latency(latency_ms, 'malware', overall=record_latency)
             
             return result
         
@@ -116,21 +187,21 @@ class ThreatEngine:
             logger.error(f"Error in malware detection: {e}")
             return {"is_malicious": False, "error": str(e)}
     
-    def analyze_behavior(self, action: Dict) -> Dict:
+    def analyze_behavior(self, action: Dict, record_latency: bool = True) -> Dict:
         """Analyze behavioral anomalies"""
         start_time = time.time()
         
         try:
-            result = self.behavior_analyzer.analyze(action)
+            result = self.behavior_analyzer.safe_analyze(action)
             
             if result['is_anomaly']:
-                self.stats['behavioral_anomalies'] += 1
+                self._increment_stats('behavioral_anomalies')
                 result['threat_type'] = 'behavioral'
             
             # Record latency
             latency_ms = (time.time() - start_time) * 1000
             result['latency_ms'] = latency_ms
-            self.stats['latencies'].append(latency_ms)
+            self._record_latency(latency_ms, 'behavioral', overall=record_latency)
             
             return result
         
@@ -144,8 +215,8 @@ class ThreatEngine:
         
         Args:
             threat_input: Dict with:
-                - type: 'url', 'code', 'action'
-                - content: Content to analyze
+                - type: 'url', 'code', 'action', or 'multi'
+                - content: Content to analyze ('multi': dict with any of url/code/action)
                 - context: Optional context
         
         Returns:
@@ -157,71 +228,25 @@ class ThreatEngine:
         context = threat_input.get('context', '')
         
         try:
-            results = {
-                "threat_type": threat_type,
-                "detected_threats": [],
-                "max_confidence": 0.0,
-                "requires_action": False,
-                "timestamp": time.time()
-            }
+            cache_key = self._cache_key(threat_type, content, context)
+            cached = self._cache_get(cache_key, start_time)
+            if cached is not None:
+                return cached
             
             # Route to appropriate detector
             if threat_type == 'url':
-                result = self.detect_phishing(content, context)
-                if result.get('is_phishing'):
-                    results['detected_threats'].append({
-                        'type': 'phishing',
-                        'confidence': result['confidence'],
-                        'reasons': result.get('reasons', [])
-                    })
-                    results['max_confidence'] = max(results['max_confidence'], result['confidence'])
-                    results['requires_action'] = True
-            
+                detections = {'url': self.detect_phishing(content, context, record_latency=False)}
             elif threat_type == 'code':
-                result = self.detect_malware(content)
-                if result.get('is_malicious'):
-                    results['detected_threats'].append({
-                        'type': 'malware',
-                        'confidence': result['confidence'],
-                        'reasons': result.get('reasons', [])
-                    })
-                    results['max_confidence'] = max(results['max_confidence'], result['confidence'])
-                    results['requires_action'] = True
-            
+                detections = {'code': self.detect_malware(content, record_latency=False)}
             elif threat_type == 'action':
-                result = self.analyze_behavior(content)
-                if result.get('is_anomaly'):
-                    results['detected_threats'].append({
-                        'type': 'behavioral',
-                        'confidence': result['confidence'],
-                        'reasons': result.get('reasons', [])
-                    })
-                    results['max_confidence'] = max(results['max_confidence'], result['confidence'])
-                    results['requires_action'] = True
-            
-            # Update statistics
-            if results['requires_action']:
-                self.stats['total_threats'] += 1
-            
-            # Record latency
-            latency_ms = (time.time() - start_time) * 1000
-            results['latency_ms'] = latency_ms
-            self.stats['latencies'].append(latency_ms)
-            
-            # Generate explanation if threat detected
-            if results['requires_action'] and results['detected_threats']:
-                threat_data = {
-                    'threat_type': results['detected_threats'][0]['type'],
-                    'confidence': results['max_confidence'],
-                    'reasons': results['detected_threats'][0]['reasons']
-                }
-                explanation = self.threat_explainer.explain_threat(threat_data)
-                results['explanation'] = explanation
-            
-            logger.info(f"Unified detection - Type: {threat_type} - "
-                       f"Threats: {len(results['detected_threats'])} - "
-                       f"Latency: {latency_ms:.2f}ms")
+                detections = {'action': self.analyze_behavior(content, record_latency=False)}
+            elif threat_type == 'multi':
+                detections = self._detect_multi(content, context)
+            else:
+                detections = {}
             
+            results = self._assess(threat_type, start_time, detections)
+            self._cache_put(cache_key, results)
             return results
         
         except Exception as e:
@@ -232,45 +257,295 @@ class ThreatEngine:
                 "requires_action": False
             }
     
-    def get_statistics(self) -> Dict:
-        """Get detection statistics"""
-        stats = self.stats.copy()
+    def _assess(self, threat_type: str, start_time: float, detections: Dict[str, Dict]) -> Dict:
+        """Merge detector results (keyed 'url'/'code'/'action') into one threat assessment"""
+        results = {
+            "threat_type": threat_type,
+            "detected_threats": [],
+            "max_confidence": 0.0,
+            "requires_action": False,
+            "timestamp": time.time()
+        }
+        
+        confidences = {}
+        for key, result in detections.items():
+            kind, flag, _ = _DETECTION_KINDS[key]
+            if result.get(flag):
+                results['detected_threats'].append({
+                    'type': kind,
+                    'confidence': result['confidence'],
+                    'reasons': result.get('reasons', [])
+                })
+                confidences[kind] = float(result['confidence'])
+                results['requires_action'] = True
+        
+        # Score confidences, severity and latency in one compiled call
+        max_conf, severity_code, latency_ms = score(
+            confidences.get('phishing', 0.0),
+            confidences.get('malware', 0.0),
+            confidences.get('behavioral', 0.0),
+            start_time,
+            time.time()
+        )
+        results['max_confidence'] = max_conf
+        results['severity'] = SEVERITY_LEVELS[severity_code]
+        
+        # Update statistics
+        if results['requires_action']:
+            self._increment_stats('total_threats')
+        
+        # Record latency
+        results['latency_ms'] = latency_ms
+        self._record_latency(latency_ms)
+        
+        # Generate explanation if threat detected
+        if results['requires_action'] and results['detected_threats']:
+            threat_data = {
+                'threat_type': results['detected_threats'][0]['type'],
+                'confidence': results['max_confidence'],
+                'reasons': results['detected_threats'][0]['reasons']
+            }
+            explanation = self.threat_explainer.explain_threat(threat_data)
+            results['explanation'] = explanation
+        
+        logger.info(f"Unified detection - Type: {threat_type} - "
+                   f"Threats: {len(results['detected_threats'])} - "
+                   f"Latency: {latency_ms:.2f}ms")
+        
+        return results
+    
+    def detect_batch(self, threat_inputs: List[Dict]) -> List[Dict]:
+        """
+        Unified threat detection for many inputs at once
+        
+        URL and code inputs are grouped and sent to their detector's batch API;
+        other types go through unified_threat_detection one by one.
+        
+        Args:
+            threat_inputs: List of dicts as accepted by unified_threat_detection
+        
+        Returns:
+            Threat assessments in input order
+        """
+        assessments = [None] * len(threat_inputs)
+        groups = {}
+        for index, threat_input in enumerate(threat_inputs):
+            groups.setdefault(threat_input.get('type', 'unknown'), []).append(index)
+        
+        for threat_type, indices in groups.items():
+            if threat_type not in ('url', 'code'):
+                for i in indices:
+                    assessments[i] = self.unified_threat_detection(threat_inputs[i])
+                continue
+            
+            start_time = time.time()
+            try:
+                keys = {}
+                for i in indices:
+                    threat_input = threat_inputs[i]
+                    key = self._cache_key(threat_type, threat_input.get('content', ''), threat_input.get('context', ''))
+                    assessments[i] = self._cache_get(key, start_time)
+                    keys[i] = key
+                indices = [i for i in indices if assessments[i] is None]
+                if not indices:
+                    continue
+                
+                contents = [threat_inputs[i].get('content', '') for i in indices]
+                if threat_type == 'url':
+                    contexts = [threat_inputs[i].get('context', '') for i in indices]
+                    batch = self.phishing_detector.detect_batch(contents, contexts)
+                else:
+                    batch = self.malware_detector.detect_batch(contents)
+                
+                kind, flag, counter = _DETECTION_KINDS[threat_type]
+                latency_ms = (time.time() - start_time) * 1000 / len(indices)
+                for i, result in zip(indices, batch):
+                    if result[flag]:
+                        self._increment_stats(counter)
+                        result['threat_type'] = kind
+                    result['latency_ms'] = latency_ms
+                    self._record_latency(latency_ms, kind, overall=False)
+                    # Back-date each item's start by its share of the batch detection time, so it
+                    # reports that share plus its own assessment rather than the whole batch so far
+                    assessments[i] = self._assess(threat_type, time.time() - latency_ms / 1000,
+                                                  {threat_type: result})
+                    self._cache_put(keys[i], assessments[i])
+            
+            except Exception as e:
+                logger.error(f"Error in batch detection: {e}")
+                # Items assessed (or served from cache) before the failure keep their results
+                for i in indices:
+                    if assessments[i] is None:
+                        assessments[i] = {"threat_type": threat_type, "error": str(e),
+                                          "requires_action": False}
+        
+        return assessments
+    
+    def _detect_multi(self, content: Dict, context: str = "") -> Dict[str, Dict]:
+        """
+        Run the detectors for every part of a composite input concurrently
+        
+        Args:
+            content: Dict with any of 'url', 'code', 'action'
+            context: Optional context for phishing detection
+        
+        Returns:
+            Detector result per content key that finished within the time budget
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(_DETECTION_KINDS), thread_name_prefix="threat-detect")
         
-        # Calculate average latency
-        if stats['latencies']:
-            stats['avg_latency_ms'] = sum(stats['latencies']) / len(stats['latencies'])
-            stats['max_latency_ms'] = max(stats['latencies'])
-            stats['min_latency_ms'] = min(stats['latencies'])
-            stats['total_latencies_recorded'] = len(stats['latencies'])
+        futures = {}
+        if content.get('url'):
+            futures[self._pool.submit(self.detect_phishing, content['url'], context,
+                                      record_latency=False)] = 'url'
+        if content.get('code'):
+            futures[self._pool.submit(self.detect_malware, content['code'], record_latency=False)] = 'code'
+        if content.get('action'):
+            futures[self._pool.submit(self.analyze_behavior, content['action'], record_latency=False)] = 'action'
+        
+        done, pending = wait(futures, timeout=_MULTI_TIMEOUT_S, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+            logger.warning(f"Detector for '{futures[future]}' exceeded {_MULTI_TIMEOUT_S * 1000:.0f}ms budget")
+        
+        # Keep url/code/action order regardless of which detector finished first
+        results = {}
+        for future in futures:
+            if future not in done:
+                continue
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                logger.error(f"Error in {futures[future]} detection: {e}")
+        return results
+    
+    def _cache_key(self, threat_type: str, content, context: str = "") -> Optional[tuple]:
+        """Cache key for url/code inputs; None for anything else"""
+        # Behavioral analysis updates per-user baselines, so actions are never cached
+        if not self._cache_size or threat_type not in ('url', 'code') or not isinstance(content, str):
+            return None
+        if threat_type == 'url' and context:
+            content = content + "\x00" + context
+        return (threat_type, _content_hash(content.encode()))
+    
+    def _cache_get(self, key: Optional[tuple], start_time: float) -> Optional[Dict]:
+        """Return a fresh copy of a cached assessment, or None on miss/expiry"""
+        if key is None:
+            return None
+        
+        now_ns = time.monotonic_ns()
+        with self._cache_lock:
+            entry = self.threat_cache.get(key)
+            if entry is None:
+                return None
+            stored_ns, cached = entry
+            if now_ns - stored_ns > self._cache_ttl_ns:
+                del self.threat_cache[key]
+                return None
+            self.threat_cache.move_to_end(key)
+        
+        # Count the hit like a fresh detection so statistics stay comparable
+        if cached['requires_action']:
+            _, _, counter = _DETECTION_KINDS[key[0]]
+            self._increment_stats(counter, 'total_threats')
+        
+        # Nested detector and explanation dicts are mutable too, so hand out a full copy
+        results = copy.deepcopy(cached)
+        results['timestamp'] = time.time()
+        results['latency_ms'] = (results['timestamp'] - start_time) * 1000
+        self._record_latency(results['latency_ms'])
+        return results
+    
+    def _cache_put(self, key: Optional[tuple], results: Dict):
+        """Remember an assessment, evicting the least recently used entry when full"""
+        if key is None:
+            return
+        entry = (time.monotonic_ns(), copy.deepcopy(results))
+        with self._cache_lock:
+            self.threat_cache[key] = entry
+            self.threat_cache.move_to_end(key)
+            if len(self.threat_cache) > self._cache_size:
+                self.threat_cache.popitem(last=False)
+    
+    def _reset_latencies(self):
+        """Clear the overall and per-detector latency windows"""
+        size = DETECTION_CONFIG['engine']['latency_window']
+        self._latency = _LatencyWindow(size)
+        self._detector_latency = {kind: _LatencyWindow(size) for kind, _, _ in _DETECTION_KINDS.values()}
+    
+    def _increment_stats(self, *counters: str):
+        """Bump detection counters under the stats lock, since detectors run concurrently"""
+        with self._stats_lock:
+            for counter in counters:
+                self.stats[counter] += 1
+    
+    def _record_latency(self, latency_ms: float, detector: Optional[str] = None, overall: bool = True):
+        """
+        Record a latency once per user event, plus once in the detector's own window
+        
+        Args:
+            latency_ms: Measured latency
+            detector: 'phishing', 'malware' or 'behavioral' for a detector call
+            overall: Also count it as an end-to-end event latency
+        """
+        with self._stats_lock:
+            if overall:
+                self._latency.record(latency_ms)
+            if detector is not None:
+                self._detector_latency[detector].record(latency_ms)
+    
+    def get_statistics(self) -> Dict:
+        """Get detection statistics (latencies cover the most recent window)"""
+        # Copy the counters and reduce the windows under the lock so each matches its count
+        with self._stats_lock:
+            stats = self.stats.copy()
+            stats.update(self._latency.summary())
+            stats['latency_by_detector'] = {
+                kind: window.summary() for kind, window in self._detector_latency.items() if window.n
+            }
         
         return stats
     
     def _process_threats(self):
         """Background thread for processing threat queue"""
-        while self.is_running:
-            try:
-                threat_input = self.threat_queue.get(timeout=1)
-                self.unified_threat_detection(threat_input)
-            except:
-                pass
+        pending = self.threat_queue
+        while not self._shutdown.is_set():
+            self._queue_ready.wait()
+            # Clear before draining so an append racing the drain re-arms the event
+            self._queue_ready.clear()
+            
+            while pending and not self._shutdown.is_set():
+                batch = []
+                while pending and len(batch) < _QUEUE_BATCH_SIZE:
+                    batch.append(pending.popleft())
+                
+                try:
+                    self.detect_batch(batch)
+                except Exception as e:
+                    logger.error(f"Error processing queued threats: {e}")
     
     def queue_threat(self, threat_input: Dict):
         """Queue threat for async processing"""
         if self.enable_async:
-            self.threat_queue.put(threat_input)
+            if len(self.threat_queue) == self.threat_queue.maxlen:
+                logger.warning("Threat queue full - dropping oldest pending threat")
+            self.threat_queue.append(threat_input)
+            self._queue_ready.set()
         else:
             self.unified_threat_detection(threat_input)
     
     def reset_statistics(self):
         """Reset detection statistics"""
-        self.stats = {
-            "total_threats": 0,
-            "phishing_detected": 0,
-            "malware_detected": 0,
-            "behavioral_anomalies": 0,
-            "avg_latency_ms": 0.0,
-            "latencies": []
-        }
+        with self._stats_lock:
+            self.stats = {
+                "total_threats": 0,
+                "phishing_detected": 0,
+                "malware_detected": 0,
+                "behavioral_anomalies": 0,
+                "avg_latency_ms": 0.0,
+            }
+        self._reset_latencies()
         logger.info("Statistics reset")
 
 # Demo usage
@@ -0,0 +1,29 @@
+# src/threat_detection/_fastpath.py
+"""
+Numeric fast path for batch detection
+JIT-compiled with Numba when available, NumPy otherwise
+"""
+
+import numpy as np
+
+# Below this many rows the per-call dispatch costs more than it saves
+JIT_MIN_BATCH = 32
+
+try:
+    from numba import njit
+    
+    @njit("float64[:](float64[:, :])", cache=True, fastmath=True)
+    def score_kernel(features):
+        """Mean feature score per row of an (N, F) feature matrix"""
+        n, f = features.shape
+        scores = np.empty(n)
+        for i in range(n):
+            total = 0.0
+            for j in range(f):
+                total += features[i, j]
+            scores[i] = total / f
+        return scores
+except ImportError:
+    def score_kernel(features):
+        """Mean feature score per row of an (N, F) feature matrix"""
+        return features.mean(axis=1)
@@ -4,14 +4,40 @@ Behavioral Anomaly Detection Module
 Detects suspicious system actions and behavioral patterns
 """
 
+import re
 import time
-from typing import Dict, List
-from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Union
+from collections import Counter, deque
 from config.settings import DETECTION_CONFIG
 from config.logger import SecurityLogger
 
 logger = SecurityLogger.get_logger(__name__)
 
+# Action types that count towards the suspicious-frequency pattern
+_SUSPICIOUS_TYPES = frozenset({"process", "registry"})
+# Actions in the pattern window
+_PATTERN_WINDOW = 10
+# Step from the previous action: not forward in time, forward < 100ms, forward >= 100ms
+_RAPID_NS = 100_000_000
+_STEP_NONE, _STEP_FAST, _STEP_SLOW = 0, 1, 2
+
+@dataclass
+class Action:
+    """A single observed system action (slotted, so no per-instance dict)"""
+    # Declared by hand because dataclass(slots=True) needs Python 3.10; slot
+    # fields cannot have class-level defaults, so every field is required
+    __slots__ = ("type", "details", "ts_ns")
+    type: str
+    details: Dict
+    ts_ns: int  # Only compared as deltas, so any monotonic nanosecond clock works
+    
+    @classmethod
+    def from_dict(cls, action: Dict) -> "Action":
+        """Build an Action from the dict format accepted by BehaviorAnalyzer.analyze"""
+        # Dict timestamps are in seconds
+        return cls(action['type'], action.get('details') or {}, round(action.get('timestamp', 0) * 1e9))
+
 class BehaviorAnalyzer:
     """Analyzes system behavior for anomalies"""
     
@@ -21,6 +47,14 @@ class BehaviorAnalyzer:
         self.window_size = DETECTION_CONFIG['behavior']['window_size']
         self.action_history = deque(maxlen=self.window_size)
         
+        # Pattern statistics over the last _PATTERN_WINDOW actions, updated on
+        # append and evict so analysis never rescans the window
+        self._recent = deque()  # (type, ts_ns, step from previous action)
+        self._type_counts = Counter()
+        self._suspicious_count = 0
+        self._step_counts = [0, 0, 0]  # indexed by _STEP_*, first action's step excluded
+        self._fast_run = 0  # Forward steps under 100ms since the last slow one
+        
         # Define normal vs suspicious actions
         self.suspicious_actions = {
             "file_access": ["system_files", "registry_access", "credential_store"],
@@ -28,15 +62,20 @@ class BehaviorAnalyzer:
             "process": ["hidden_process", "privilege_escalation", "process_injection"],
             "registry": ["dangerous_registry_edit", "startup_modification"],
         }
+        # One alternation per action type, matched against lower-cased details
+        self._type_patterns = {
+            k: re.compile('|'.join(re.escape(p.lower()) for p in v))
+            for k, v in self.suspicious_actions.items()
+        }
         
         logger.info("BehaviorAnalyzer initialized")
     
-    def analyze(self, action: Dict) -> Dict:
+    def analyze(self, action: Union[Action, Dict]) -> Dict:
         """
         Analyze a user action for suspicious behavior
         
         Args:
-            action: Action to analyze with format:
+            action: Action to analyze, either an Action or a dict with format:
                 {
                     'type': 'file_access|network|process|registry',
                     'details': {...},
@@ -46,43 +85,48 @@ class BehaviorAnalyzer:
         Returns:
             Dict with anomaly assessment
         """
-        try:
-            if not action or 'type' not in action:
-                return {
-                    "is_anomaly": False,
-                    "confidence": 0.0,
-                    "threat_level": "safe",
-                    "reasons": []
-                }
-            
-            # Add to history
-            self.action_history.append(action)
-            
-            # Calculate action risk
-            action_risk = self._calculate_action_risk(action)
-            
-            # Analyze behavioral patterns
-            pattern_score = self._analyze_patterns()
-            
-            # Combined anomaly score
-            anomaly_score = (action_risk * 0.6 + pattern_score * 0.4)
-            
-            is_anomaly = anomaly_score >= self.threshold
-            
-            result = {
-                "is_anomaly": is_anomaly,
-                "confidence": min(anomaly_score, 1.0),
-                "threat_level": "high" if is_anomaly else "safe",
-                "action_risk": action_risk,
-                "pattern_score": pattern_score,
-                "reasons": self._generate_reasons(action, action_risk, pattern_score)
+        if isinstance(action, dict) and 'type' in action:
+            action = Action.from_dict(action)
+        if not isinstance(action, Action):
+            return {
+                "is_anomaly": False,
+                "confidence": 0.0,
+                "threat_level": "safe",
+                "reasons": []
             }
-            
-            if is_anomaly:
-                logger.warning(f"Anomaly detected: {action['type']} - Score: {anomaly_score:.2f}")
-            
-            return result
         
+        # Add to history
+        self._record(action)
+        
+        # Calculate action risk
+        action_risk = self._calculate_action_risk(action)
+        
+        # Analyze behavioral patterns
+        pattern_score = self._analyze_patterns()
+        
+        # Combined anomaly score
+        anomaly_score = (action_risk * 0.6 + pattern_score * 0.4)
+        
+        is_anomaly = anomaly_score >= self.threshold
+        
+        result = {
+            "is_anomaly": is_anomaly,
+            "confidence": min(anomaly_score, 1.0),
+            "threat_level": "high" if is_anomaly else "safe",
+            "action_risk": action_risk,
+            "pattern_score": pattern_score,
+            "reasons": self._generate_reasons(action, action_risk, pattern_score)
+        }
+        
+        if is_anomaly:
+            logger.warning(f"Anomaly detected: {action.type} - Score: {anomaly_score:.2f}")
+        
+        return result
+    
+    def safe_analyze(self, action: Union[Action, Dict]) -> Dict:
+        """analyze() for API boundaries: unexpected errors are logged and reported as unknown"""
+        try:
+            return self.analyze(action)
         except Exception as e:
             logger.error(f"Error in behavior analysis: {e}")
             return {
@@ -92,23 +136,50 @@ class BehaviorAnalyzer:
                 "reasons": ["Error in analysis"]
             }
     
-    def _calculate_action_risk(self, action: Dict) -> float:
+    def _calculate_action_risk(self, action: Action) -> float:
         """Calculate risk score for a single action"""
-        action_type = action.get('type', '')
-        details = action.get('details', {})
-        
         # Check if action type is suspicious
-        suspicious_categories = self.suspicious_actions.get(action_type, [])
+        pattern = self._type_patterns.get(action.type)
         
-        # Check if this specific action matches any suspicious patterns
-        for detail_key, detail_value in details.items():
-            for suspicious_pattern in suspicious_categories:
-                if suspicious_pattern.lower() in str(detail_value).lower():
-                    return 0.8
+        # Check if this specific action matches any suspicious patterns; values are
+        # NUL-separated so a match cannot span two of them
+        if pattern is not None and action.details:
+            blob = "\x00".join(map(str, action.details.values())).lower()
+            if pattern.search(blob):
+                return 0.8
         
         # Default moderate risk for uncommon actions
         return 0.3
     
+    def _record(self, action: Action):
+        """Append an action to the history and slide the pattern window"""
+        self.action_history.append(action)
+        
+        action_type = action.type
+        ts = action.ts_ns
+        recent = self._recent
+        
+        step = _STEP_NONE
+        if recent:
+            diff = ts - recent[-1][1]
+            if diff > 0:
+                step = _STEP_FAST if diff < _RAPID_NS else _STEP_SLOW
+                self._fast_run = self._fast_run + 1 if step == _STEP_FAST else 0
+            self._step_counts[step] += 1
+        
+        recent.append((action_type, ts, step))
+        self._type_counts[action_type] += 1
+        if action_type in _SUSPICIOUS_TYPES:
+            self._suspicious_count += 1
+        
+        if len(recent) > _PATTERN_WINDOW:
+            evicted_type, _, _ = recent.popleft()
+            self._type_counts[evicted_type] -= 1
+            if evicted_type in _SUSPICIOUS_TYPES:
+                self._suspicious_count -= 1
+            # The new oldest action's step now points outside the window
+            self._step_counts[recent[0][2]] -= 1
+    
     def _analyze_patterns(self) -> float:
         """Analyze patterns in action history"""
         if len(self.action_history) < 3:
@@ -117,37 +188,29 @@ class BehaviorAnalyzer:
         pattern_score = 0.0
         
         # Pattern 1: High frequency of suspicious actions
-        recent_actions = list(self.action_history)[-10:]
-        suspicious_count = sum(1 for a in recent_actions 
-                             if a.get('type') in ['process', 'registry'])
-        if suspicious_count > 5:
+        if self._suspicious_count > 5:
             pattern_score += 0.4
         
         # Pattern 2: Repeated similar actions (potential exploitation)
-        action_types = [a.get('type') for a in recent_actions]
-        same_type_count = max([action_types.count(t) for t in set(action_types)])
-        if same_type_count > 7:
+        if max(self._type_counts.values()) > 7:
             pattern_score += 0.3
         
         # Pattern 3: Rapid succession of actions (potential automated attack)
-        if len(recent_actions) >= 2:
-            time_diffs = []
-            for i in range(1, len(recent_actions)):
-                t1 = recent_actions[i-1].get('timestamp', 0)
-                t2 = recent_actions[i].get('timestamp', 0)
-                if t2 - t1 > 0:
-                    time_diffs.append(t2 - t1)
-            
-            if time_diffs and all(td < 0.1 for td in time_diffs[-5:]):  # Actions < 100ms apart
-                pattern_score += 0.3
+        # i.e. the last five forward steps (or all of them, if fewer) were < 100ms apart.
+        # With no slow step in the window every forward step in it is fast; otherwise
+        # the run since the last slow step lies entirely inside the window.
+        forward = self._step_counts[_STEP_FAST] + self._step_counts[_STEP_SLOW]
+        if forward and (not self._step_counts[_STEP_SLOW] or self._fast_run >= min(forward, 5)):
+            pattern_score += 0.3
         
         return min(pattern_score, 0.8)
     
-    def _generate_reasons(self, action: Dict, action_risk: float, pattern_score: float) -> List[str]:
+    def _generate_reasons(self, action: Action, action_risk: float, pattern_score: float) -> List[str]:
         """Generate human-readable reasons for anomaly detection"""
         reasons = []
         
-        action_type = action.get('type', 'unknown')
+        action_type = action.type
+        details = action.details
         
         if action_risk > 0.6:
             reasons.append(f"Suspicious {action_type} action detected")
@@ -155,10 +218,10 @@ class BehaviorAnalyzer:
         if pattern_score > 0.5:
             reasons.append("Unusual pattern in system actions")
         
-        if action.get('details', {}).get('elevated_privileges'):
+        if details.get('elevated_privileges'):
             reasons.append("Action requires elevated privileges")
         
-        if action.get('details', {}).get('hidden'):
+        if details.get('hidden'):
             reasons.append("Hidden/stealth activity detected")
         
         if not reasons:
@@ -176,53 +239,37 @@ class ActionCollector:
     
     def log_file_access(self, file_path: str, operation: str, elevated: bool = False) -> Dict:
         """Log file access action"""
-        action = {
-            "type": "file_access",
-            "details": {
-                "file_path": file_path,
-                "operation": operation,
-                "elevated_privileges": elevated
-            },
-            "timestamp": time.time()
-        }
+        action = Action("file_access", {
+            "file_path": file_path,
+            "operation": operation,
+            "elevated_privileges": elevated
+        }, time.monotonic_ns())
         return self.analyzer.analyze(action)
     
     def log_network_activity(self, destination: str, port: int, protocol: str) -> Dict:
         """Log network activity"""
-        action = {
-            "type": "network",
-            "details": {
-                "destination": destination,
-                "port": port,
-                "protocol": protocol
-            },
-            "timestamp": time.time()
-        }
+        action = Action("network", {
+            "destination": destination,
+            "port": port,
+            "protocol": protocol
+        }, time.monotonic_ns())
         return self.analyzer.analyze(action)
     
     def log_process_action(self, process_name: str, action: str, hidden: bool = False) -> Dict:
         """Log process action"""
-        action_obj = {
-            "type": "process",
-            "details": {
-                "process_name": process_name,
-                "action": action,
-                "hidden": hidden
-            },
-            "timestamp": time.time()
-        }
+        action_obj = Action("process", {
+            "process_name": process_name,
+            "action": action,
+            "hidden": hidden
+        }, time.monotonic_ns())
         return self.analyzer.analyze(action_obj)
     
     def log_registry_modification(self, key_path: str, value: str) -> Dict:
         """Log registry modification"""
-        action = {
-            "type": "registry",
-            "details": {
-                "key_path": key_path,
-                "value": value
-            },
-            "timestamp": time.time()
-        }
+        action = Action("registry", {
+            "key_path": key_path,
+            "value": value
+        }, time.monotonic_ns())
         return self.analyzer.analyze(action)
 
 # Demo usage
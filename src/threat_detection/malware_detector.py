@@ -7,7 +7,7 @@ Detects malicious scripts and suspicious code patterns
 import json
 import re
 import hashlib
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from config.settings import DETECTION_CONFIG, DATA_DIR
 from config.logger import SecurityLogger
 
@@ -63,39 +63,83 @@ class MalwareDetector:
         """
         try:
             if not code:
-                return {
-                    "is_malicious": False,
-                    "confidence": 0.0,
-                    "threat_level": "safe",
-                    "reasons": ["Empty content"]
-                }
+                return self._empty_result()
             
-            # Analyze code for threats
-            threat_features = self._analyze_code(code, source_type)
-            threat_score = self._calculate_threat_score(threat_features)
-            
-            is_malicious = threat_score >= self.confidence_threshold
-            
-            result = {
-                "is_malicious": is_malicious,
-                "confidence": min(threat_score, 1.0),
-                "threat_level": "high" if is_malicious else "safe",
-                "reasons": self._generate_reasons(threat_features),
-                "code_hash": hashlib.sha256(code.encode()).hexdigest()[:8],
-                "source_type": source_type,
-            }
+            result, threat_score = self._assess(code, source_type)
             
             logger.info(f"Malware detection - Source: {source_type} - Score: {threat_score:.2f}")
             return result
         
         except Exception as e:
             logger.error(f"Error in malware detection: {e}")
-            return {
-                "is_malicious": False,
-                "confidence": 0.0,
-                "threat_level": "unknown",
-                "reasons": ["Error in detection"]
-            }
+            return self._error_result()
+    
+    def detect_batch(self, codes: List[str], source_type: str = "script") -> List[Dict]:
+        """
+        Detect malicious patterns in many code samples in one call
+        
+        Args:
+            codes: Code or script contents to analyze
+            source_type: Type of source shared by all samples
+        
+        Returns:
+            List of threat assessments, one per sample
+        """
+        results = []
+        flagged = 0
+        
+        for code in codes:
+            try:
+                result = self._assess(code, source_type)[0] if code else self._empty_result()
+            except Exception as e:
+                logger.error(f"Error in malware detection: {e}")
+                result = self._error_result()
+            flagged += result['is_malicious']
+            results.append(result)
+        
+        # One summary line instead of one per sample
+        logger.info(f"Malware batch detection - Source: {source_type} - "
+                   f"Samples: {len(codes)} - Flagged: {flagged}")
+        return results
+    
+    def _assess(self, code: str, source_type: str) -> Tuple[Dict, float]:
+        """Score non-empty code, returning the assessment and the raw threat score"""
+        # Analyze code for threats
+        threat_features = self._analyze_code(code, source_type)
+        threat_score = self._calculate_threat_score(threat_features)
+        
+        is_malicious = threat_score >= self.confidence_threshold
+        
+        result = {
+            "is_malicious": is_malicious,
+            "confidence": min(threat_score, 1.0),
+            "threat_level": "high" if is_malicious else "safe",
+            "reasons": self._generate_reasons(threat_features),
+            # Display/correlation fingerprint only, not a security property
+            "code_hash": hashlib.blake2b(code.encode(), digest_size=4).hexdigest(),
+            "source_type": source_type,
+        }
+        return result, threat_score
+    
+    @staticmethod
+    def _empty_result() -> Dict:
+        """Assessment for empty content"""
+        return {
+            "is_malicious": False,
+            "confidence": 0.0,
+            "threat_level": "safe",
+            "reasons": ["Empty content"]
+        }
+    
+    @staticmethod
+    def _error_result() -> Dict:
+        """Assessment when detection itself failed"""
+        return {
+            "is_malicious": False,
+            "confidence": 0.0,
+            "threat_level": "unknown",
+            "reasons": ["Error in detection"]
+        }
     
     def _analyze_code(self, code: str, source_type: str) -> Dict:
         """Analyze code for malware indicators"""
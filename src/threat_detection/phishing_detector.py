@@ -7,47 +7,124 @@ Uses lightweight ML models for real-time phishing detection
 import json
 import re
 import hashlib
+import bisect
+import functools
+import numpy as np
+from types import MappingProxyType
+from urllib.parse import urlsplit
 from typing import Dict, Tuple, List
 from config.settings import DETECTION_CONFIG, DATA_DIR
 from config.logger import SecurityLogger
+from src.threat_detection._fastpath import score_kernel, JIT_MIN_BATCH
 
 logger = SecurityLogger.get_logger(__name__)
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+@functools.lru_cache(maxsize=1)
+def _load_patterns_cached() -> MappingProxyType:
+    """Parse the phishing patterns file once per process (read-only, shared by all detectors)"""
+    try:
+        return MappingProxyType(_json_loads((DATA_DIR / "phishing_patterns.json").read_bytes()))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error loading phishing patterns: {e}")
+    
+    # Default patterns if file doesn't exist
+    return MappingProxyType({
+        "keywords": ["verify", "confirm", "update", "validate", "secure"],
+        "suspicious_tlds": [".tk", ".ml", ".ga", ".cf"],
+    })
+
+# Compiled once at import and shared by every detector instance
+# Validation only needs the first character after the scheme, so URL_REGEX has
+# no trailing `+` to walk the rest of the URL; URLs are ASCII by spec. `$-_` is the
+# range $ through _ (digits, upper case, `%`, `:`, and `[` for IPv6 literal hosts)
+URL_REGEX = re.compile(r'^https?://[!$-_a-z]', re.ASCII)
+IP_URL_REGEX = re.compile(r'^https?://\d+\.\d+\.\d+\.\d+', re.ASCII)
+
+# Known suspicious domains, shared read-only by every detector instance
+SUSPICIOUS_DOMAINS = frozenset({
+    "paypa1.com", "amaz0n.com", "go0gle.com", "bank-verify.com",
+    "account-confirm.com", "secure-login.com", "update-verify.com"
+})
+
+# Feature keys in the order _extract_url_features reports them
+_FEATURE_NAMES = (
+    "url_length_score", "domain_score", "special_char_score",
+    "ip_address_score", "subdomain_score", "context_score",
+)
+
+# Threshold ladders as (exclusive lower edges, score per bucket): a value above
+# edges[k-1] and at most edges[k] scores scores[k]
+_LEN_EDGES, _LEN_SCORES = (100, 200), (0.0, 0.5, 0.8)
+_SPECIAL_EDGES, _SPECIAL_SCORES = (2,), (0.0, 0.6)
+_SUBDOMAIN_EDGES, _SUBDOMAIN_SCORES = (3,), (0.0, 0.6)
+# Array forms for bucketing whole batch columns at once
+_LADDERS = tuple(
+    (np.array(edges), np.array(scores))
+    for edges, scores in ((_LEN_EDGES, _LEN_SCORES), (_SPECIAL_EDGES, _SPECIAL_SCORES),
+                          (_SUBDOMAIN_EDGES, _SUBDOMAIN_SCORES))
+)
+
+# Vectorized string ops: numpy.strings (numpy >= 2.0) or the older numpy.char
+_np_str = getattr(np, "strings", np.char)
+
+# Look-alike fragment -> legitimate brands it imitates
+_LOOKALIKES = {
+    "paypa": ("paypal",),
+    "amaz": ("amazon",),
+    "goog": ("google",),
+    "face": ("facebook",),
+}
+
+try:
+    import ahocorasick
+    
+    # One automaton over every fragment and brand, scanned in C per domain
+    _LOOKALIKE_AC = ahocorasick.Automaton()
+    for _key, _brands in _LOOKALIKES.items():
+        _LOOKALIKE_AC.add_word(_key, _key)
+        for _brand in _brands:
+            _LOOKALIKE_AC.add_word(_brand, _brand)
+    _LOOKALIKE_AC.make_automaton()
+except ImportError:
+    _LOOKALIKE_AC = None
+
 class PhishingDetector:
     """Detects phishing links using heuristics and ML models"""
     
+    # (feature key, score it must exceed, reason reported), in reporting order
+    _REASON_TABLE = (
+        ('url_length_score', 0.5, "Unusually long URL"),
+        ('domain_score', 0.5, "Suspicious domain name"),
+        ('special_char_score', 0.5, "Suspicious special characters in URL"),
+        ('ip_address_score', 0.5, "Using IP address instead of domain"),
+        ('subdomain_score', 0.5, "Too many subdomains"),
+        ('context_score', 0.3, "Context contains phishing keywords"),
+    )
+    
     def __init__(self):
         """Initialize phishing detector with known patterns"""
         self.confidence_threshold = DETECTION_CONFIG['phishing']['confidence_threshold']
         self.patterns_db = self._load_phishing_patterns()
-        self.suspicious_domains = self._init_suspicious_domains()
-        self.url_regex = re.compile(
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        )
+        self._tld_tuple = tuple(self.patterns_db.get("suspicious_tlds", []))
+        self._phishing_keywords_lower = tuple(kw.lower() for kw in self.patterns_db.get("keywords", []))
+        self.suspicious_domains = SUSPICIOUS_DOMAINS
+        
+        # Verdicts are deterministic per (url, context score, threshold), so repeats are a lookup
+        self._assess_cached = functools.lru_cache(
+            maxsize=DETECTION_CONFIG['phishing']['cache_size']
+        )(self._assess_scored)
         logger.info("PhishingDetector initialized")
     
-    def _load_phishing_patterns(self) -> Dict:
+    def _load_phishing_patterns(self) -> MappingProxyType:
         """Load phishing patterns from database"""
-        try:
-            patterns_file = DATA_DIR / "phishing_patterns.json"
-            if patterns_file.exists():
-                with open(patterns_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading phishing patterns: {e}")
-        
-        # Default patterns if file doesn't exist
-        return {
-            "keywords": ["verify", "confirm", "update", "validate", "secure"],
-            "suspicious_tlds": [".tk", ".ml", ".ga", ".cf"],
-        }
-    
-    def _init_suspicious_domains(self) -> set:
-        """Initialize list of known suspicious domains"""
-        return {
-            "paypa1.com", "amaz0n.com", "go0gle.com", "bank-verify.com",
-            "account-confirm.com", "secure-login.com", "update-verify.com"
-        }
+        return _load_patterns_cached()
     
     def detect(self, url: str, context: str = "") -> Dict:
         """
@@ -60,104 +137,214 @@ class PhishingDetector:
         Returns:
             Dict with threat assessment
         """
-        try:
-            # Validate URL format
-            if not url or not self._is_valid_url(url):
-                return {
-                    "is_phishing": False,
-                    "confidence": 0.0,
-                    "threat_level": "safe",
-                    "reasons": ["Invalid URL format"]
-                }
-            
-            # Heuristic-based detection
-            features = self._extract_url_features(url)
-            features['context_score'] = self._analyze_context(context)
-            
-            # Calculate threat score
-            threat_score = self._calculate_threat_score(features)
-            
-            # Determine if phishing
-            is_phishing = threat_score >= self.confidence_threshold
-            
-            result = {
-                "is_phishing": is_phishing,
-                "confidence": min(threat_score, 1.0),
-                "threat_level": "high" if is_phishing else "safe",
-                "reasons": self._generate_reasons(features),
-                "url_hash": hashlib.sha256(url.encode()).hexdigest()[:8]
-            }
-            
-            logger.info(f"Phishing detection - URL: {url[:50]}... - Score: {threat_score:.2f}")
-            return result
+        # Validate URL format
+        if not url or not isinstance(url, str) or not self._is_valid_url(url):
+            return self._invalid_result()
+        
+        result, threat_score = self._assess(url, context)
         
+        logger.info(f"Phishing detection - URL: {url[:50]}... - Score: {threat_score:.2f}")
+        return result
+    
+    def safe_detect(self, url: str, context: str = "") -> Dict:
+        """detect() for API boundaries: unexpected errors are logged and reported as unknown"""
+        try:
+            return self.detect(url, context)
         except Exception as e:
             logger.error(f"Error in phishing detection: {e}")
-            return {
-                "is_phishing": False,
-                "confidence": 0.0,
-                "threat_level": "unknown",
-                "reasons": ["Error in detection"]
-            }
+            return self._error_result()
+    
+    def detect_batch(self, urls: List[str], contexts: List[str] = None) -> List[Dict]:
+        """
+        Detect phishing for many URLs in one call
+        
+        Args:
+            urls: URLs to check
+            contexts: Optional context per URL; ValueError unless it matches urls in length
+        
+        Returns:
+            List of threat assessments, one per URL
+        """
+        contexts = contexts or [""] * len(urls)
+        if len(contexts) != len(urls):
+            raise ValueError(f"Got {len(contexts)} contexts for {len(urls)} URLs")
+        results = [None] * len(urls)
+        valid = []  # (index, context score) for URLs that reach scoring
+        
+        for i, (url, context) in enumerate(zip(urls, contexts)):
+            try:
+                if not url or not self._is_valid_url(url):
+                    results[i] = self._invalid_result()
+                else:
+                    valid.append((i, self._analyze_context(context)))
+            except Exception as e:
+                logger.error(f"Error in phishing detection: {e}")
+                results[i] = self._error_result()
+        
+        if len(valid) >= JIT_MIN_BATCH:
+            matrix = self._feature_matrix([urls[i] for i, _ in valid], [c for _, c in valid])
+            scores = score_kernel(matrix).tolist()
+            scored = [(i, dict(zip(_FEATURE_NAMES, row))) for (i, _), row in zip(valid, matrix.tolist())]
+        else:
+            scored = []
+            for i, context_score in valid:
+                try:
+                    scored.append((i, self._features(urls[i], context_score)))
+                except Exception as e:
+                    logger.error(f"Error in phishing detection: {e}")
+                    results[i] = self._error_result()
+            scores = [self._calculate_threat_score(features) for _, features in scored]
+        
+        for (i, features), threat_score in zip(scored, scores):
+            results[i] = self._build_result(urls[i], features, threat_score)
+        flagged = sum(result['is_phishing'] for result in results)
+        
+        # One summary line instead of one per URL
+        logger.info(f"Phishing batch detection - URLs: {len(urls)} - Flagged: {flagged}")
+        return results
+    
+    def _feature_matrix(self, urls: List[str], context_scores: List[float]) -> np.ndarray:
+        """
+        Feature scores for many valid URLs as an (N, 6) matrix in _FEATURE_NAMES order
+        
+        Lengths and character counts come from numpy string ops over the whole
+        batch and the threshold ladders bucket a column at a time; the set and
+        pattern lookups stay per URL.
+        """
+        n = len(urls)
+        matrix = np.empty((n, len(_FEATURE_NAMES)), dtype=np.float64)
+        hosts = []
+        for row, url in enumerate(urls):
+            host = self._host(url)
+            hosts.append(host)
+            matrix[row, 1] = self._score_domain(host)
+            matrix[row, 3] = self._score_ip_address(url)
+        matrix[:, 5] = context_scores
+        
+        url_arr = np.array(urls, dtype=str)
+        raw = (  # length, special chars, host dots
+            _np_str.str_len(url_arr),
+            _np_str.count(url_arr, '@') + _np_str.count(url_arr, '?'),
+            _np_str.count(np.array(hosts, dtype=str), '.'),
+        )
+        for column, values, (edges, scores) in zip((0, 2, 4), raw, _LADDERS):
+            matrix[:, column] = scores[np.searchsorted(edges, values, side="left")]
+        return matrix
+    
+    def _assess(self, url: str, context: str) -> Tuple[Dict, float]:
+        """Score a valid URL, returning the assessment and the raw threat score"""
+        # The context only enters through its keyword score, which keeps the cache key small
+        result, threat_score = self._assess_cached(
+            url, self._analyze_context(context), self.confidence_threshold
+        )
+        # Callers annotate results in place, so never hand out the cached dict
+        return dict(result), threat_score
+    
+    def _assess_scored(self, url: str, context_score: float, threshold: float) -> Tuple[Dict, float]:
+        """Uncached core of _assess, given the context's keyword score (threshold keys the cache)"""
+        features = self._features(url, context_score)
+        
+        # Calculate threat score
+        threat_score = self._calculate_threat_score(features)
+        return self._build_result(url, features, threat_score), threat_score
+    
+    def _features(self, url: str, context_score: float) -> Dict:
+        """Heuristic feature scores for a valid URL and its context score"""
+        features = self._extract_url_features(url)
+        features['context_score'] = context_score
+        return features
+    
+    def _build_result(self, url: str, features: Dict, threat_score: float) -> Dict:
+        """Turn feature scores and their aggregate into a threat assessment"""
+        # Determine if phishing
+        is_phishing = threat_score >= self.confidence_threshold
+        
+        result = {
+            "is_phishing": is_phishing,
+            "confidence": min(threat_score, 1.0),
+            "threat_level": "high" if is_phishing else "safe",
+            "reasons": self._generate_reasons(features),
+            # Display/correlation fingerprint only, not a security property
+            "url_hash": hashlib.blake2b(url.encode(), digest_size=4).hexdigest()
+        }
+        return result
+    
+    @staticmethod
+    def _invalid_result() -> Dict:
+        """Assessment for a missing or malformed URL"""
+        return {
+            "is_phishing": False,
+            "confidence": 0.0,
+            "threat_level": "safe",
+            "reasons": ["Invalid URL format"]
+        }
+    
+    @staticmethod
+    def _error_result() -> Dict:
+        """Assessment when detection itself failed"""
+        return {
+            "is_phishing": False,
+            "confidence": 0.0,
+            "threat_level": "unknown",
+            "reasons": ["Error in detection"]
+        }
     
     def _is_valid_url(self, url: str) -> bool:
         """Check if URL has valid format"""
-        return bool(self.url_regex.match(url))
+        return URL_REGEX.match(url) is not None
     
     def _extract_url_features(self, url: str) -> Dict:
         """Extract features from URL for threat scoring"""
+        host = self._host(url)
         features = {
             "url_length_score": self._score_url_length(url),
-            "domain_score": self._score_domain(url),
+            "domain_score": self._score_domain(host),
             "special_char_score": self._score_special_chars(url),
             "ip_address_score": self._score_ip_address(url),
-            "subdomain_score": self._score_subdomains(url),
+            "subdomain_score": self._score_subdomains(host),
         }
         return features
     
+    @staticmethod
+    def _host(url: str) -> str:
+        """Lower-case hostname of a URL, parsed once for every scorer"""
+        try:
+            return (urlsplit(url).hostname or "").lower()
+        except ValueError:
+            # e.g. an unbalanced IPv6 bracket
+            return ""
+    
     def _score_url_length(self, url: str) -> float:
         """Score based on URL length (very long URLs are suspicious)"""
-        length = len(url)
-        if length > 200:
-            return 0.8
-        elif length > 100:
-            return 0.5
-        return 0.0
+        return _LEN_SCORES[bisect.bisect_left(_LEN_EDGES, len(url))]
     
-    def _score_domain(self, url: str) -> float:
-        """Score domain for suspicious characteristics"""
-        try:
-            # Extract domain
-            domain = url.split('/')[2].lower()
-            
-            # Check if in suspicious list
-            if domain in self.suspicious_domains:
-                return 0.9
-            
-            # Check for suspicious TLDs
-            for tld in self.patterns_db.get("suspicious_tlds", []):
-                if domain.endswith(tld):
-                    return 0.7
-            
-            # Check for look-alike domains
-            if self._is_lookalike_domain(domain):
-                return 0.7
-            
-            return 0.0
-        except Exception as e:
-            logger.warning(f"Error scoring domain: {e}")
-            return 0.0
+    def _score_domain(self, domain: str) -> float:
+        """Score a lower-case hostname for suspicious characteristics"""
+        # Check if in suspicious list
+        if domain in SUSPICIOUS_DOMAINS:
+            return 0.9
+        
+        # Check for suspicious TLDs
+        if domain.endswith(self._tld_tuple):
+            return 0.7
+        
+        # Check for look-alike domains
+        if self._is_lookalike_domain(domain):
+            return 0.7
+        
+        return 0.0
     
     def _is_lookalike_domain(self, domain: str) -> bool:
         """Check if domain looks like a legitimate site"""
-        lookalikes = {
-            "paypa": ["paypal"],
-            "amaz": ["amazon"],
-            "goog": ["google"],
-            "face": ["facebook"],
-        }
+        if _LOOKALIKE_AC is not None:
+            hits = {match for _, match in _LOOKALIKE_AC.iter(domain)}
+            return any(
+                key in hits and sim in hits and domain != f"{sim}.com"
+                for key, similar in _LOOKALIKES.items()
+                for sim in similar
+            )
         
-        for key, similar in lookalikes.items():
+        for key, similar in _LOOKALIKES.items():
             if key in domain:
                 for sim in similar:
                     if sim in domain and domain != f"{sim}.com":
@@ -167,24 +354,17 @@ class PhishingDetector:
     def _score_special_chars(self, url: str) -> float:
         """Score based on suspicious special characters"""
         special_chars = url.count('@') + url.count('?')
-        if special_chars > 2:
-            return 0.6
-        return 0.0
+        return _SPECIAL_SCORES[bisect.bisect_left(_SPECIAL_EDGES, special_chars)]
     
     def _score_ip_address(self, url: str) -> bool:
         """Check if URL uses IP address instead of domain"""
-        ip_pattern = re.compile(r'http[s]?://\d+\.\d+\.\d+\.\d+')
-        if ip_pattern.match(url):
+        if IP_URL_REGEX.match(url):
             return 0.8
         return 0.0
     
-    def _score_subdomains(self, url: str) -> float:
+    def _score_subdomains(self, host: str) -> float:
         """Score based on number of subdomains"""
-        domain_part = url.split('/')[2]
-        subdomain_count = domain_part.count('.')
-        if subdomain_count > 3:
-            return 0.6
-        return 0.0
+        return _SUBDOMAIN_SCORES[bisect.bisect_left(_SUBDOMAIN_EDGES, host.count('.'))]
     
     def _analyze_context(self, context: str) -> float:
         """Analyze surrounding context for phishing indicators"""
@@ -192,9 +372,8 @@ class PhishingDetector:
             return 0.0
         
         context_lower = context.lower()
-        phishing_keywords = self.patterns_db.get("keywords", [])
-        
-        keyword_count = sum(1 for kw in phishing_keywords if kw in context_lower)
+        # Per-keyword substring tests beat a compiled alternation regex here
+        keyword_count = sum(1 for kw in self._phishing_keywords_lower if kw in context_lower)
         return min(keyword_count * 0.15, 0.5)
     
     def _calculate_threat_score(self, features: Dict) -> float:
@@ -206,25 +385,9 @@ class PhishingDetector:
     
     def _generate_reasons(self, features: Dict) -> List[str]:
         """Generate human-readable reasons for threat assessment"""
-        reasons = []
-        
-        if features['url_length_score'] > 0.5:
-            reasons.append("Unusually long URL")
-        if features['domain_score'] > 0.5:
-            reasons.append("Suspicious domain name")
-        if features['special_char_score'] > 0.5:
-            reasons.append("Suspicious special characters in URL")
-        if features['ip_address_score'] > 0.5:
-            reasons.append("Using IP address instead of domain")
-        if features['subdomain_score'] > 0.5:
-            reasons.append("Too many subdomains")
-        if features['context_score'] > 0.3:
-            reasons.append("Context contains phishing keywords")
-        
-        if not reasons:
-            reasons.append("URL appears legitimate")
-        
-        return reasons
+        return [
+            message for key, threshold, message in self._REASON_TABLE if features[key] > threshold
+        ] or ["URL appears legitimate"]
 
 # Demo usage
 if __name__ == "__main__":